@@ -0,0 +1,54 @@
+"""
+Airway expansion, first (graph search) and repeated (memoized) segment lookups.
+
+Run from the application directory:
+    python -m benchmarks.airways
+"""
+import asyncio
+import os
+import sqlite3
+import time
+from loguru import logger
+from server.database import Database
+from benchmarks.fixtures import build_database
+
+ROUNDS = 10000
+
+
+async def main():
+    logger.remove()
+    path = build_database(routes=5000)
+    try:
+        db = sqlite3.connect(path)
+        segments = db.execute(
+            'SELECT ident, MIN(rowid), MAX(rowid) FROM high_routes GROUP BY ident LIMIT 1000'
+        ).fetchall()
+        pairs = [
+            (ident, db.execute('SELECT start_ident FROM high_routes WHERE rowid=?', (first, )).fetchone()[0],
+             db.execute('SELECT end_ident FROM high_routes WHERE rowid=?', (last, )).fetchone()[0])
+            for ident, first, last in segments
+        ]
+        db.close()
+
+        database = Database(path)
+        await database.open()
+        graph = database.airways
+        print(f'Graph built in {graph.build_seconds * 1000:.1f} ms')
+
+        started = time.perf_counter()
+        expanded = [graph.expand(*pair) for pair in pairs]
+        cold = (time.perf_counter() - started) / len(pairs)
+        print(f'First expansion:    {cold * 1e6:.2f} us per segment, {sum(len(fixes) for fixes in expanded if fixes)} fixes')
+
+        started = time.perf_counter()
+        for index in range(ROUNDS):
+            graph.expand(*pairs[index % len(pairs)])
+        warm = (time.perf_counter() - started) / ROUNDS
+        print(f'Memoized expansion: {warm * 1e6:.2f} us per segment')
+        await database.close()
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
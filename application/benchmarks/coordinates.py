@@ -0,0 +1,54 @@
+"""
+Coordinate codec throughput, scalar calls against the NumPy batch path.
+
+Run from the application directory:
+    python -m benchmarks.coordinates
+"""
+import time
+import numpy
+from server import coordinates
+
+COUNT = 200000
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def report(name, count, scalar_time, batch_time):
+    print(
+        f'{name:<22} scalar {scalar_time / count * 1e6:7.3f} us, batch {batch_time / count * 1e6:7.3f} us, '
+        f'{scalar_time / batch_time:5.1f}x'
+    )
+
+
+def main():
+    generator = numpy.random.default_rng(1)
+    latitudes = numpy.round(generator.uniform(-90, 90, COUNT) * 3600) / 3600
+    longitudes = numpy.round(generator.uniform(-180, 180, COUNT) * 3600) / 3600
+
+    for axis, values in [(coordinates.LATITUDE, latitudes), (coordinates.LONGITUDE, longitudes)]:
+        encoded, scalar_time = timed(lambda: [coordinates.encode_dms(value, axis) for value in values.tolist()])
+        encoded_batch, batch_time = timed(coordinates.encode_dms_array, values, axis)
+        assert encoded == encoded_batch.tolist()
+        report(f'encode dms {axis}', COUNT, scalar_time, batch_time)
+
+        decoded, scalar_time = timed(lambda: [coordinates.decode(text, axis) for text in encoded])
+        decoded_batch, batch_time = timed(coordinates.decode_array, encoded, axis)
+        assert numpy.allclose(decoded, decoded_batch) and numpy.allclose(decoded_batch, values)
+        report(f'decode dms {axis}', COUNT, scalar_time, batch_time)
+
+    positions = [
+        coordinates.encode_icao(latitude, longitude)
+        for latitude, longitude in zip(numpy.round(latitudes).tolist(), numpy.round(longitudes).tolist())
+    ]
+    decoded, scalar_time = timed(lambda: [coordinates.decode_position(text) for text in positions])
+    decoded_batch, batch_time = timed(coordinates.decode_positions, positions)
+    assert numpy.allclose(decoded, decoded_batch)
+    report('decode icao positions', COUNT, scalar_time, batch_time)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Per plan lookup latency with a fresh connection per query vs the pooled connections.
+
+Run from the application directory:
+    python -m benchmarks.database_pool
+"""
+import asyncio
+import contextlib
+import os
+import time
+import aiosqlite
+from loguru import logger
+from server.database import Database
+from benchmarks.fixtures import build_database, sample_route, sequential_lookups
+
+ROUNDS = 20
+
+
+class OneShotDatabase(Database):
+    """ Previous behaviour, a new connection for every single query. """
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        async with aiosqlite.connect(self.database) as db:
+            db.row_factory = aiosqlite.Row
+            yield db
+
+
+async def time_enrichment(database, route_str):
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        await sequential_lookups(database, route_str)
+    return (time.perf_counter() - started) / ROUNDS
+
+
+async def main():
+    logger.remove()
+    path = build_database()
+    try:
+        route_str = sample_route(path)
+
+        one_shot = OneShotDatabase(path)
+        one_shot_time = await time_enrichment(one_shot, route_str)
+
+        pooled = Database(path)
+        await pooled.open()
+        pooled_time = await time_enrichment(pooled, route_str)
+        await pooled.close()
+
+        print(f'Route tokens: {len(route_str.split(" "))}')
+        print(f'Connection per query: {one_shot_time * 1000:.2f} ms per plan')
+        print(f'Pooled connections:   {pooled_time * 1000:.2f} ms per plan')
+        print(f'Speedup: {one_shot_time / pooled_time:.1f}x')
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,33 @@
+"""
+Route wide disambiguation cost for growing routes and candidate set sizes.
+
+Run from the application directory:
+    python -m benchmarks.disambiguation
+"""
+import time
+import numpy
+from server.disambiguation import shortest_path
+
+ROUNDS = 20
+
+
+def main():
+    generator = numpy.random.default_rng(1)
+    for length in [50, 500, 2000]:
+        for candidates_per_step in [1, 4, 16]:
+            candidates = [
+                numpy.column_stack([
+                    generator.uniform(-80, 80, candidates_per_step),
+                    generator.uniform(-180, 180, candidates_per_step)
+                ])
+                for _ in range(length)
+            ]
+            started = time.perf_counter()
+            for _ in range(ROUNDS):
+                shortest_path(candidates, start=(51.5, -0.5), end=(40.6, -73.8))
+            elapsed = (time.perf_counter() - started) / ROUNDS
+            print(f'{length:5d} steps x {candidates_per_step:2d} candidates: {elapsed * 1000:8.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
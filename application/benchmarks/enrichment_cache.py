@@ -0,0 +1,64 @@
+"""
+Plan enrichment when a plan is posted again, full lookups vs the enrichment result cache.
+
+Run from the application directory:
+    python -m benchmarks.enrichment_cache
+"""
+import asyncio
+import json
+import os
+import time
+from loguru import logger
+from server.database import Database
+from server.plan import Plan
+from server.json_encoder import json_encoder
+from benchmarks.fixtures import build_database, sample_route, fake_server, write_snapshot
+
+ROUNDS = 50
+
+
+def enriched(plan):
+    return json.dumps({key: value for key, value in plan.plan.items() if key != 'created_datetime'}, default=json_encoder)
+
+
+def sample_plan(route_str):
+    return {'callsign': 'THY1', 'departure': 'ltfm', 'destination': 'EGLL', 'alternate': 'EHAM', 'route': route_str}
+
+
+async def time_posts(server, plan_data):
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        plan = Plan(plan_data, server)
+        await plan.populate_rich_data()
+    return plan, (time.perf_counter() - started) / ROUNDS
+
+
+async def main():
+    logger.remove()
+    path = build_database()
+    snapshot_path = await write_snapshot(path)
+    try:
+        database = Database(path)
+        await database.open()
+        for length in [20, 60, 200]:
+            plan_data = sample_plan(sample_route(path, length=length))
+            server = fake_server(database)
+            server.enrichment_cache.max_size = 0
+            uncached, uncached_time = await time_posts(server, plan_data)
+
+            server = fake_server(database)
+            cached, cached_time = await time_posts(server, plan_data)
+            assert enriched(uncached) == enriched(cached)
+            print(
+                f'{length:4d} tokens: lookups {uncached_time * 1000:7.3f} ms, '
+                f'cached {cached_time * 1000:7.3f} ms, {uncached_time / cached_time:5.1f}x'
+            )
+
+        await database.close()
+    finally:
+        os.remove(path)
+        os.remove(snapshot_path)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
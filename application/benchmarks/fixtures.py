@@ -0,0 +1,126 @@
+import os
+import random
+import sqlite3
+import string
+import sys
+import tempfile
+import types
+import aiosqlite
+from server.cache import LookupCache
+
+# The navdata builder lives outside the application package.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'data'))
+import openairports  # noqa: E402
+
+AIRPORT_IDENTS = ['EGLL', 'KJFK', 'EDDF', 'LFPG', 'LTFM', 'EHAM', 'KLAX', 'OMDB']
+
+
+def random_ident(rand, length):
+    return ''.join(rand.choice(string.ascii_uppercase) for _ in range(length))
+
+
+def build_database(path=None, airports=5000, navaids=3000, waypoints=20000, routes=500, seed=1):
+    """ Create a synthetic navdata database shaped like the one data/openairports.py builds.
+
+    Returns:
+        str: Path of the created database.
+    """
+    if path is None:
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+
+    rand = random.Random(seed)
+    db = sqlite3.connect(path)
+    for table in ['airports', 'navaids', 'waypoints', 'routes', 'high_routes']:
+        db.execute(f'DROP TABLE IF EXISTS {table}')
+
+    db.execute('CREATE TABLE airports (id INTEGER PRIMARY KEY, ident TEXT, type TEXT, name TEXT, latitude_deg REAL, longitude_deg REAL, '
+               'elevation_ft INTEGER, iso_country TEXT, iso_region TEXT)')
+    db.execute('CREATE TABLE navaids (id INTEGER PRIMARY KEY, ident TEXT, name TEXT, type TEXT, latitude_deg REAL, longitude_deg REAL, iso_country TEXT)')
+    db.execute('CREATE TABLE waypoints (ident TEXT, latitude_deg REAL, longitude_deg REAL, region TEXT)')
+    for table in ['routes', 'high_routes']:
+        db.execute(f'CREATE TABLE {table} (ident TEXT, start_ident TEXT, start_latitude_deg REAL, start_longitude_deg REAL, '
+                   'end_ident TEXT, end_latitude_deg REAL, end_longitude_deg REAL)')
+
+    idents = AIRPORT_IDENTS + [random_ident(rand, 4) for _ in range(airports - len(AIRPORT_IDENTS))]
+    db.executemany('INSERT INTO airports VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', [
+        (index, ident, 'large_airport', f'{ident} Airport', rand.uniform(-60, 70), rand.uniform(-180, 180), 100, 'XX', 'XX-1')
+        for index, ident in enumerate(idents)
+    ])
+    db.executemany('INSERT INTO navaids VALUES (?, ?, ?, ?, ?, ?, ?)', [
+        (index, random_ident(rand, 3), 'Navaid', 'VOR', rand.uniform(-60, 70), rand.uniform(-180, 180), 'XX')
+        for index in range(navaids)
+    ])
+    waypoint_rows = [
+        (random_ident(rand, 5), rand.uniform(-60, 70), rand.uniform(-180, 180), 'XX')
+        for _ in range(waypoints)
+    ]
+    db.executemany('INSERT INTO waypoints VALUES (?, ?, ?, ?)', waypoint_rows)
+
+    for table, prefix in [('routes', 'L'), ('high_routes', 'UL')]:
+        route_rows = []
+        for number in range(routes):
+            fixes = rand.sample(waypoint_rows, 8)
+            for start, end in zip(fixes, fixes[1:]):
+                route_rows.append((f'{prefix}{number}', start[0], start[1], start[2], end[0], end[1], end[2]))
+        db.executemany(f'INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?, ?)', route_rows)
+
+    for table in ['airports', 'navaids', 'waypoints', 'routes', 'high_routes']:
+        db.execute(f'CREATE INDEX {table}_ident_idx ON {table} (ident)')
+    db.execute('ANALYZE')
+    db.commit()
+    db.close()
+    return path
+
+
+def sample_route(path, length=60, seed=2):
+    """ Build a route string mixing known fixes, navaids, airways and unknown tokens. """
+    rand = random.Random(seed)
+    db = sqlite3.connect(path)
+    waypoints = [row[0] for row in db.execute('SELECT ident FROM waypoints LIMIT 2000')]
+    navaids = [row[0] for row in db.execute('SELECT ident FROM navaids LIMIT 500')]
+    airways = [row[0] for row in db.execute('SELECT DISTINCT ident FROM high_routes LIMIT 100')]
+    db.close()
+
+    tokens = []
+    while len(tokens) < length:
+        pick = rand.random()
+        if pick < 0.5:
+            tokens.append(rand.choice(waypoints))
+        elif pick < 0.7:
+            tokens.append(rand.choice(navaids))
+        elif pick < 0.85:
+            tokens.append(rand.choice(airways))
+        elif pick < 0.95:
+            tokens.append('DCT')
+        else:
+            tokens.append(random_ident(rand, 6))
+
+    return ' '.join(tokens)
+
+
+def fake_server(database):
+    """ Minimal stand in for FSLServer, enough for Plan and Route. """
+    return types.SimpleNamespace(database=database, enrichment_cache=LookupCache(256))
+
+
+async def sequential_lookups(database, route_str):
+    """ Per token, per table lookup chain the way Waypoint.enrich used to query. """
+    for token in route_str.split(' '):
+        if token == 'DCT':
+            continue
+        for call in [database.waypoint_from_ident, database.navaid_from_ident,
+                     database.route_from_ident, database.high_route_from_ident]:
+            if await call(token):
+                break
+
+
+async def write_snapshot(path):
+    """ Stamp a build id on the database and write its snapshot with the navdata builder. """
+    async with aiosqlite.connect(path) as db:
+        build_id = await openairports.write_build_id(db)
+        await db.commit()
+        snapshot_path = os.path.splitext(path)[0] + '.snap'
+        await openairports.write_snapshot(db, snapshot_path, build_id)
+
+    return snapshot_path
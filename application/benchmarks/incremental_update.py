@@ -0,0 +1,78 @@
+"""
+Plan.update after a one token edit, enriching the whole new route vs re-resolving only what changed.
+
+Run from the application directory:
+    python -m benchmarks.incremental_update
+"""
+import asyncio
+import os
+import random
+import time
+from loguru import logger
+from server.database import Database
+from server.plan import Plan
+from benchmarks.fixtures import build_database, sample_route, fake_server
+
+ROUNDS = 20
+
+
+def edit_route(route_str, seed=3):
+    """ Replace one token with another ident of the route. """
+    rand = random.Random(seed)
+    tokens = route_str.split(' ')
+    tokens[rand.randrange(len(tokens))] = rand.choice(tokens)
+    return ' '.join(tokens)
+
+
+def plan_data(route_str):
+    return {'callsign': 'THY1', 'departure': 'LTFM', 'destination': 'EGLL', 'route': route_str}
+
+
+async def time_full(server, edited):
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        plan = Plan(plan_data(edited), server)
+        await plan.populate_rich_data()
+    return plan, (time.perf_counter() - started) / ROUNDS
+
+
+async def time_incremental(server, route_str, edited):
+    elapsed = 0
+    for _ in range(ROUNDS):
+        plan = Plan(plan_data(route_str), server)
+        await plan.populate_rich_data()
+        started = time.perf_counter()
+        plan.update(plan_data(edited))
+        stale = len(plan.get('route').stale)
+        await plan.populate_rich_data()
+        elapsed += time.perf_counter() - started
+    return plan, stale, elapsed / ROUNDS
+
+
+async def main():
+    logger.remove()
+    path = build_database()
+    try:
+        database = Database(path, cache_size=0, filter_error_rate=None)
+        await database.open()
+        server = fake_server(database)
+        for length in [20, 60, 200, 1000]:
+            route_str = sample_route(path, length=length)
+            edited = edit_route(route_str)
+            full, full_time = await time_full(server, edited)
+            incremental, stale, incremental_time = await time_incremental(server, route_str, edited)
+            differing = sum(
+                first != second for first, second in zip(full.get('route').toJSON(), incremental.get('route').toJSON())
+            )
+            print(
+                f'{length:5d} tokens: full {full_time * 1000:8.2f} ms, incremental {incremental_time * 1000:7.2f} ms '
+                f'({stale} tokens resolved), {differing} waypoints differ from a full enrichment'
+            )
+
+        await database.close()
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
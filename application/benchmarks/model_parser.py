@@ -0,0 +1,173 @@
+"""
+Plan and waypoint parsing, the interpreted ``model_parser`` the plan module used to run against
+the compiled ``ModelParser``. It is kept here as the reference the compiled parser must match.
+
+Run from the application directory:
+    python -m benchmarks.model_parser
+"""
+import builtins
+import time
+from loguru import logger
+import server.exceptions
+from server.plan import MODEL, WAYPOINT_MODEL, PLAN_PARSER, WAYPOINT_PARSER
+from benchmarks.fixtures import fake_server
+
+ROUNDS = 100
+REPEATS = 5
+WAYPOINTS = 500
+
+
+def model_parser(data, model, **kwargs):
+    """Parse input data according to a model.
+
+    Args:
+        data (Dict): Input data
+        model (Dict): Input model
+
+    Raises:
+        server.exceptions.MissingField: Raises when required field is missing or badly formatted.
+
+    Returns:
+        List: [parsed_data, parse_errors]
+    """
+    formatted = {}
+    errors = []
+
+    # FORMAT DATA PER MODEL
+    for key, value in data.items():
+        # CHECK IF SPEC EXISTS
+        try:
+            spec = model[key]
+        except KeyError:
+            errors.append({
+                'key': key,
+                'message': f'Spec not found {key}. Passing.'
+            })
+            continue
+
+        # Only type.
+        if isinstance(spec, str):
+            try:
+                formatted_value = getattr(builtins, spec)(value)
+            except ValueError:
+                errors.append({
+                    'key': key,
+                    'message': f'Input {value} in wrong format or value for {key}. Passing.'
+                })
+                continue
+        else:
+            # Has an external formatter
+            if 'format' in spec:
+                try:
+                    formatted_value = spec['format'](value, **kwargs)
+                except ValueError:
+                    errors.append({
+                        'key': key,
+                        'message': f'Input {value} in wrong format or value for {key}. Passing.'
+                    })
+                    continue
+            # Internal type and other attributes.
+            else:
+                try:
+                    # type
+                    formatted_value = getattr(builtins, spec['type'])(value)
+                    if 'max' in spec and spec['max'] < len(value):
+                        errors.append({
+                            'key': key,
+                            'message': f'Out of max value {key}. Passing.'
+                        })
+                        continue
+                    if 'min' in spec and spec['min'] > len(value):
+                        errors.append({
+                            'key': key,
+                            'message': f'Out of min value {key}. Passing.'
+                        })
+                        continue
+                except KeyError:
+                    errors.append({
+                        'key': key,
+                        'message': f'Spec does have type for {key}. Passing.'
+                    })
+                    continue
+        formatted[key] = formatted_value
+
+    # CHECK FOR REQUIRED FIELDS
+    for key, value in model.items():
+        if isinstance(value, dict) and 'required' in value and value['required']:
+            if key not in formatted:
+                error_msg = f'Missing required field {key}'
+                logger.error(error_msg)
+                raise server.exceptions.MissingField(key, None, error_msg)
+
+    if errors:
+        logger.warning(errors)
+
+    return [formatted, errors]
+
+
+def sample_waypoints(count):
+    waypoints = []
+    for index in range(count):
+        waypoint = {
+            'name': f'WP{index:03d}',
+            'latitude': f'{50 + index / 1000:.4f}',
+            'longitude': str(-30 + index / 1000),
+            'altitude': '35000',
+            'speed': 450
+        }
+        if index % 50 == 0:
+            waypoint['speed'] = 'fast'
+            waypoint['unknown'] = True
+        waypoints.append(waypoint)
+
+    return waypoints
+
+
+def sample_plan():
+    return {
+        'callsign': 'THY1',
+        'departure': 'LTFM',
+        'destination': 'EGLL',
+        'destination_runway': '27LX',
+        'cruise_altitude': '37000',
+        'departure_time': '12:30',
+        'departure_date': '2026-10-18',
+        'block_fuel': 'lots',
+        'route': 'DCT',
+        'extra': 1
+    }
+
+
+def timed(function, items):
+    """ Best of REPEATS averages, the machine is rarely quiet for a whole run. """
+    best = None
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        for _ in range(ROUNDS):
+            results = [function(item) for item in items]
+        elapsed = (time.perf_counter() - started) / ROUNDS
+        best = elapsed if best is None else min(best, elapsed)
+    return results, best
+
+
+def main():
+    logger.remove()
+    server = fake_server(None)
+    cases = [
+        ('waypoints', sample_waypoints(WAYPOINTS), WAYPOINT_MODEL, WAYPOINT_PARSER),
+        ('plan fields', [sample_plan()], MODEL, PLAN_PARSER)
+    ]
+    for name, items, model, parser in cases:
+        interpreted, interpreted_time = timed(lambda item: model_parser(item, model, server=server), items)
+        compiled, compiled_time = timed(lambda item: parser.parse(item, server=server), items)
+        assert [[str(value) for value in result[0].values()] for result in interpreted] == \
+            [[str(value) for value in result[0].values()] for result in compiled]
+        assert [result[1] for result in interpreted] == [result[1] for result in compiled]
+        print(
+            f'{name:<12} x{len(items):4d}: model_parser {interpreted_time * 1000:7.3f} ms, '
+            f'ModelParser {compiled_time * 1000:7.3f} ms, {interpreted_time / compiled_time:4.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Plan response serialization, ``json.dumps`` over ``toJSON`` against the cached section payloads.
+
+Times a first serialization, the plan sent again unchanged, and again after an update
+which only changes header fields.
+
+Run from the application directory:
+    python -m benchmarks.plan_payload
+"""
+import asyncio
+import json
+import os
+import time
+from loguru import logger
+import server.json_encoder
+from server.database import Database
+from server.json_encoder import json_encoder
+from server.plan import Plan
+from benchmarks.fixtures import build_database, sample_route, fake_server
+
+ROUNDS = 50
+
+
+def plan_data(route_str):
+    return {'callsign': 'THY1', 'departure': 'LTFM', 'destination': 'EGLL', 'cruise_speed': 450, 'route': route_str}
+
+
+def timed(function):
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = function()
+    return result, (time.perf_counter() - started) / ROUNDS
+
+
+def first_payload(plan):
+    plan.invalidate()
+    return plan.payload()
+
+
+def header_update(plan, data):
+    data['cruise_altitude'] = data.get('cruise_altitude', 30000) + 100
+    plan.update(data)
+    return plan.payload()
+
+
+async def main():
+    logger.remove()
+    path = build_database()
+    try:
+        database = Database(path)
+        await database.open()
+        plan_server = fake_server(database)
+
+        for length in [60, 1000]:
+            data = plan_data(sample_route(path, length=length))
+            plan = Plan(data, plan_server)
+            await plan.populate_rich_data()
+
+            encoded, dumps_time = timed(lambda: json.dumps(plan, default=json_encoder))
+            payload, first_time = timed(lambda: first_payload(plan))
+            assert json.loads(payload) == json.loads(encoded)
+            _, cached_time = timed(plan.payload)
+            payload, update_time = timed(lambda: header_update(plan, data))
+            assert json.loads(payload) == json.loads(json.dumps(plan, default=json_encoder))
+
+            orjson = server.json_encoder.orjson
+            server.json_encoder.orjson = None
+            try:
+                standard, _ = timed(lambda: first_payload(plan))
+            finally:
+                server.json_encoder.orjson = orjson
+            assert standard == first_payload(plan)
+
+            print(
+                f'{length:5d} tokens: json.dumps {dumps_time * 1000:7.3f} ms, payload first {first_time * 1000:7.3f} ms, '
+                f'cached {cached_time * 1000:7.3f} ms, header update and payload {update_time * 1000:7.3f} ms '
+                f'({"orjson" if orjson else "json"})'
+            )
+
+        await database.close()
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
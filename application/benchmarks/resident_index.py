@@ -0,0 +1,50 @@
+"""
+Resident navdata index, build time and size, and route enrichment against SQLite.
+
+Run from the application directory:
+    python -m benchmarks.resident_index
+"""
+import asyncio
+import os
+import time
+from loguru import logger
+from server.database import Database
+from server.plan import Route
+from benchmarks.fixtures import build_database, sample_route, fake_server
+
+ROUNDS = 50
+
+
+async def time_enrichment(database, route_str):
+    server = fake_server(database)
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        await Route(route_str, server).enrich()
+    return (time.perf_counter() - started) / ROUNDS
+
+
+async def main():
+    logger.remove()
+    path = build_database()
+    try:
+        route_str = sample_route(path)
+
+        sqlite_db = Database(path)
+        await sqlite_db.open()
+        sqlite_time = await time_enrichment(sqlite_db, route_str)
+        await sqlite_db.close()
+
+        resident_db = Database(path, resident=True)
+        await resident_db.open()
+        print(resident_db.index.report())
+        resident_time = await time_enrichment(resident_db, route_str)
+        await resident_db.close()
+
+        print(f'SQLite:   {sqlite_time * 1000:.3f} ms per plan')
+        print(f'Resident: {resident_time * 1000:.3f} ms per plan')
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
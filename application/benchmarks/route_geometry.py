@@ -0,0 +1,72 @@
+"""
+Route geometry cost, Plan.update_geometry over resolved routes against a per leg math loop.
+
+Run from the application directory:
+    python -m benchmarks.route_geometry
+"""
+import math
+import time
+import numpy
+from loguru import logger
+from server.plan import Plan
+from server.geo import great_circle_nm, leg_geometry
+from benchmarks.fixtures import fake_server
+
+REPEATS = 200
+
+
+def resolved_plan(count, seed=1):
+    generator = numpy.random.default_rng(seed)
+    latitudes = generator.uniform(-60, 70, count)
+    longitudes = generator.uniform(-180, 180, count)
+    waypoints = [
+        {'name': f'WP{index:05d}', 'latitude': latitude, 'longitude': longitude}
+        for index, (latitude, longitude) in enumerate(zip(latitudes.tolist(), longitudes.tolist()))
+    ]
+    plan = Plan({'callsign': 'THY1', 'departure': 'LTFM', 'destination': 'EGLL', 'route': waypoints, 'cruise_speed': 450}, fake_server(None))
+    plan.plan['airports'] = {}
+    return plan, latitudes, longitudes
+
+
+def scalar_legs(latitudes, longitudes):
+    legs = []
+    for lat1, lon1, lat2, lon2 in zip(latitudes, longitudes, latitudes[1:], longitudes[1:]):
+        phi1, phi2, d_lambda = math.radians(lat1), math.radians(lat2), math.radians(lon2 - lon1)
+        course = math.degrees(math.atan2(
+            math.sin(d_lambda) * math.cos(phi2),
+            math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(d_lambda)
+        )) % 360
+        legs.append((great_circle_nm(lat1, lon1, lat2, lon2), course))
+    return legs
+
+
+def best_time(function, *args):
+    best = None
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    logger.remove()
+    for count in [100, 1000, 10000]:
+        plan, latitudes, longitudes = resolved_plan(count)
+        distances, courses = leg_geometry(latitudes, longitudes)
+        legs = scalar_legs(latitudes.tolist(), longitudes.tolist())
+        assert numpy.allclose(distances, [leg[0] for leg in legs])
+        assert numpy.allclose(courses, [leg[1] for leg in legs])
+
+        scalar_time = best_time(scalar_legs, latitudes.tolist(), longitudes.tolist())
+        array_time = best_time(leg_geometry, latitudes, longitudes)
+        stage_time = best_time(plan.update_geometry)
+        print(
+            f'{count:6d} fixes: math loop {scalar_time * 1e6:9.1f} us, leg_geometry {array_time * 1e6:7.1f} us, '
+            f'update_geometry {stage_time * 1e6:8.1f} us'
+        )
+
+
+if __name__ == '__main__':
+    main()
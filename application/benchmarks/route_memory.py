@@ -0,0 +1,92 @@
+"""
+Per waypoint memory and construction time of a Route, from an ident string and from waypoint dicts.
+
+``DictRoute`` is the layout ``Route`` replaced, a ``DictWaypoint`` holding a parsed dict per
+waypoint. It is kept here as the reference the columns are measured against.
+
+Run from the application directory:
+    python -m benchmarks.route_memory
+"""
+import gc
+import time
+import tracemalloc
+from loguru import logger
+from server.plan import Route, WAYPOINT_PARSER
+from benchmarks.fixtures import fake_server
+
+REPEATS = 5
+
+
+class DictWaypoint:
+    def __init__(self, waypoint, server):
+        parsed = WAYPOINT_PARSER.parse(waypoint, server=server)
+        self.server = server
+        self.waypoint = parsed[0]
+        self.errors = parsed[1]
+
+
+class DictRoute:
+    def __init__(self, route, server):
+        self.server = server
+        self.waypoints = []
+        if isinstance(route, list):
+            for item in route:
+                self.waypoints.append(DictWaypoint(item, server))
+        else:
+            splitted_route = route.split(' ')
+            for wp_name in splitted_route:
+                self.waypoints.append(DictWaypoint({
+                    'name': wp_name
+                }, server))
+
+
+LAYOUTS = [('columns', Route), ('dicts', DictRoute)]
+
+
+def sample_sources(count):
+    names = ' '.join(f'WP{index:04d}' for index in range(count))
+    waypoints = [
+        {'name': f'WP{index:04d}', 'latitude': 50 + index / 10000, 'longitude': -30 - index / 10000, 'altitude': 35000}
+        for index in range(count)
+    ]
+    return [('ident string', names), ('waypoint dicts', waypoints)]
+
+
+def route_size(layout, source, server):
+    """ Bytes allocated for a route, not counting its source or the shared token cache. """
+    layout(source, server)
+    gc.collect()
+    tracemalloc.start()
+    route = layout(source, server)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del route
+    return size
+
+
+def construction_time(layout, source, server):
+    best = None
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        layout(source, server)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    logger.remove()
+    server = fake_server(None)
+    for count in [500, 5000]:
+        for name, source in sample_sources(count):
+            for layout_name, layout in LAYOUTS:
+                size = route_size(layout, source, server)
+                elapsed = construction_time(layout, source, server)
+                print(
+                    f'{count:5d} waypoints from {name:<14} as {layout_name:<7}: '
+                    f'{size / count:7.1f} bytes, {elapsed / count * 1e6:6.2f} us per waypoint'
+                )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Route ident resolution, per token per table queries vs one bulk query for the whole route.
+
+Run from the application directory:
+    python -m benchmarks.route_resolution
+"""
+import asyncio
+import os
+import time
+from loguru import logger
+from server.database import Database
+from server.plan import Route
+from benchmarks.fixtures import build_database, sample_route, sequential_lookups, fake_server
+
+ROUNDS = 20
+
+
+async def time_rounds(coro_factory):
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        await coro_factory()
+    return (time.perf_counter() - started) / ROUNDS
+
+
+async def main():
+    logger.remove()
+    path = build_database()
+    try:
+        database = Database(path)
+        await database.open()
+        server = fake_server(database)
+
+        for length in [20, 60, 200]:
+            route_str = sample_route(path, length=length)
+            sequential_time = await time_rounds(lambda: sequential_lookups(database, route_str))
+            bulk_time = await time_rounds(lambda: Route(route_str, server).enrich())
+            print(f'{length:4d} tokens: sequential {sequential_time * 1000:8.2f} ms, bulk {bulk_time * 1000:8.2f} ms')
+
+        await database.close()
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+Route syntax classification, tokens read per route and idents left for the database.
+
+ICAO syntax (speed and level groups, changes at a point, positions, SID/STAR markers)
+is mixed into the synthetic routes, only fix and airway idents should be looked up.
+
+Run from the application directory:
+    python -m benchmarks.route_tokens
+"""
+import asyncio
+import os
+import random
+import time
+from loguru import logger
+from server.database import Database
+from server.plan import Route
+from server.route_syntax import tokenize
+from benchmarks.fixtures import build_database, sample_route, fake_server
+
+ROUNDS = 20
+SYNTAX = ['N0450F350', 'K0830S1130', 'M082F370', '46N050W', '4600N05000W', '5030N', 'VFR', 'IFR', 'SID', 'STAR']
+
+
+def icao_route(path, length, seed=3):
+    """ A sample route with about a third of its tokens route syntax instead of idents. """
+    rand = random.Random(seed)
+    tokens = []
+    for token in sample_route(path, length=length, seed=seed).split(' '):
+        pick = rand.random()
+        if pick < 0.2:
+            tokens.append(rand.choice(SYNTAX))
+        elif pick < 0.3 and token != 'DCT':
+            token = f'{token}/N0{rand.randint(400, 499)}F{rand.randint(300, 410)}'
+        tokens.append(token)
+    return '  '.join(tokens)
+
+
+async def main():
+    logger.remove()
+    path = build_database()
+    try:
+        database = Database(path)
+        await database.open()
+        server = fake_server(database)
+
+        for length in [60, 1000]:
+            route_str = icao_route(path, length)
+            started = time.perf_counter()
+            for _ in range(ROUNDS):
+                tokens = tokenize(route_str)
+            tokenize_time = (time.perf_counter() - started) / ROUNDS
+
+            route = Route(route_str, server)
+            looked_up = []
+            resolve_idents = database.resolve_idents
+
+            async def counted(idents):
+                looked_up.extend(idents)
+                return await resolve_idents(idents)
+
+            database.resolve_idents = counted
+            await route.enrich()
+            del database.resolve_idents
+            print(
+                f'{len(tokens):5d} tokens: tokenize {tokenize_time / len(tokens) * 1e6:5.2f} us per token, '
+                f'{len(looked_up):5d} idents looked up'
+            )
+
+        await database.close()
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
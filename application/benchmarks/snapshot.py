@@ -0,0 +1,60 @@
+"""
+Memory mapped navdata snapshot, cold open time and route enrichment against SQLite.
+
+Run from the application directory:
+    python -m benchmarks.snapshot
+"""
+import asyncio
+import os
+import time
+from loguru import logger
+from server.database import Database
+from server.plan import Route
+from server.snapshot import NavdataSnapshot
+from benchmarks.fixtures import build_database, sample_route, fake_server, write_snapshot
+
+ROUNDS = 50
+
+
+async def time_enrichment(database, route_str):
+    server = fake_server(database)
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        await Route(route_str, server).enrich()
+    return (time.perf_counter() - started) / ROUNDS
+
+
+async def main():
+    logger.remove()
+    path = build_database(waypoints=200000)
+    snapshot_path = await write_snapshot(path)
+    try:
+        route_str = sample_route(path)
+
+        started = time.perf_counter()
+        snapshot = NavdataSnapshot(snapshot_path)
+        snapshot.open()
+        open_time = time.perf_counter() - started
+        snapshot.close()
+        print(f'Snapshot size {os.path.getsize(snapshot_path) / 1048576:.1f} MiB, opened in {open_time * 1000:.3f} ms')
+
+        sqlite_db = Database(path, snapshot='missing.snap')
+        await sqlite_db.open()
+        sqlite_time = await time_enrichment(sqlite_db, route_str)
+        await sqlite_db.close()
+
+        snapshot_db = Database(path)
+        await snapshot_db.open()
+        assert snapshot_db.snapshot, 'Snapshot was not picked up.'
+        snapshot_time = await time_enrichment(snapshot_db, route_str)
+        await snapshot_db.close()
+
+        print(f'SQLite:   {sqlite_time * 1000:.3f} ms per plan')
+        print(f'Snapshot: {snapshot_time * 1000:.3f} ms per plan')
+    finally:
+        os.remove(path)
+        os.remove(snapshot_path)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -259,8 +259,7 @@ class MainWindow(QMainWindow, GUICommon):
             return
 
         fields = self.read_form_data()
-        plan.update(fields)
-        logger.debug(plan)
+        self.run_async(plan.refresh, fields)
 
     def read_form_data(self):
         dep_time = self.ui.departure_time.time().toString('HH:mm')
@@ -23,6 +23,8 @@ class FSLApp:
     def start(self):
         self.server_thread.start()
         self.gui.start()
+        self.server.stop()
+        self.server_thread.join()
 
 
 if __name__ == '__main__':
@@ -1,4 +1,5 @@
 import re
+import sqlite3
 import importlib
 import json
 import base64
@@ -11,17 +12,25 @@ import aiohttp_cors
 from loguru import logger
 from server.plan import Plan
 from server.settings import Settings, DeleteFlag
+from server.cache import LookupCache
 import server.exceptions
 import server.events
 import server.database
-from server.json_encoder import json_encoder
+from server.json_encoder import dumps
 
 DEFAULT_SETTINGS = {
     'pilot': {
         'name': 'ENTER YOUR NAME',
         'base': 'BASE'
     },
-    'exporters': []
+    'exporters': [],
+    'database': {
+        'resident': False,
+        'cache_size': 4096,
+        'cache_ttl': None,
+        'filter_error_rate': 0.01,
+        'enrichment_cache_size': 256
+    }
 }
 
 
@@ -31,6 +40,7 @@ class FSLServer:
         available_exporters: ``dict`` with keys as module id's.
             module_id: module.
         exporters: ``list`` of initiated exporters.
+        enrichment_cache: ``LookupCache`` of plan enrichment results, see ``Plan.populate_rich_data``.
     """
     def __init__(self, settings=None):
         self.available_exporters = {}
@@ -45,7 +55,15 @@ class FSLServer:
         self.define_routes()
         self.runner = web.AppRunner(self.app)
         self.active_plan = None
-        self.database = server.database.Database()
+        self.database = server.database.Database(
+            resident=self.settings.get('database', 'resident'),
+            cache_size=self.settings.get('database', 'cache_size'),
+            cache_ttl=self.settings.get('database', 'cache_ttl'),
+            filter_error_rate=self.settings.get('database', 'filter_error_rate')
+        )
+        self.enrichment_cache = LookupCache(self.settings.get('database', 'enrichment_cache_size'))
+        self.app.on_startup.append(self.open_database)
+        self.app.on_cleanup.append(self.close_database)
 
         self.import_available_exporters()
 
@@ -117,6 +135,16 @@ class FSLServer:
                 self.initiate_exporters()
                 return
 
+    async def open_database(self, app):
+        try:
+            await self.database.open()
+        except (sqlite3.Error, OSError) as exc:
+            # The server still starts, lookups open the database again once it is built.
+            logger.error(f'Could not open the navdata database {self.database.database}: {exc}')
+
+    async def close_database(self, app):
+        await self.database.close()
+
     def define_routes(self):
         self.app.add_routes(
             [
@@ -143,8 +171,17 @@ class FSLServer:
         self.initiate_exporters()
         self.loop = asyncio.new_event_loop()
         asyncio.set_event_loop(self.loop)
-        self.loop.run_until_complete(self.start_site())
-        self.loop.run_forever()
+        try:
+            self.loop.run_until_complete(self.start_site())
+            self.loop.run_forever()
+        finally:
+            # Runs the on_cleanup handlers, closing the database connections.
+            self.loop.run_until_complete(self.runner.cleanup())
+            self.loop.close()
+
+    def stop(self):
+        """ Stop the loop of ``server_thread_runner`` from another thread, it cleans up before returning. """
+        self.loop.call_soon_threadsafe(self.loop.stop)
 
     def start(self):
         """ Blocking, shortcut function to run the site. """
@@ -210,7 +247,7 @@ class FSLServer:
             if 'secondary_plan' in req_data:
                 secondary_plan = Plan(req_data["secondary_plan"], self)
                 if not plan.get('alternate'):
-                    plan.plan['alternate'] = secondary_plan.get("destination")
+                    plan.set('alternate', secondary_plan.get("destination"))
 
         except server.exceptions.MissingField as exc:
             return web.HTTPUnprocessableEntity(body=json.dumps({
@@ -218,18 +255,21 @@ class FSLServer:
             }))
 
         await self.set_active_plan(plan)
-        await plan.populate_rich_data()
+        # Published to the GUI already, its edits wait for the first enrichment, see ``Plan.refresh``.
+        async with plan.lock:
+            await plan.populate_rich_data()
 
         export_errors = await self.export(plan, only_auto_active=True)
-        body = {
-            'plan': plan,
-            'secondary_plan': secondary_plan,
-            'export_errors': export_errors
-        }
+        # The response body is joined from the plans' cached section payloads, see ``Plan.payload``.
+        body = b'{"plan":%s,"secondary_plan":%s,"export_errors":%s}' % (
+            plan.payload(),
+            secondary_plan.payload() if secondary_plan else b'null',
+            dumps(export_errors)
+        )
 
         logger.debug(plan)
         await self.events.run_async_observers_for('post_plan', plan)
-        return web.Response(body=json.dumps(body, default=json_encoder), headers=headers)
+        return web.Response(body=body, headers=headers, content_type='application/json')
         # return web.Response(body='ok')
 
     async def export(self, plan, only_uuids=[], only_auto_active=False):
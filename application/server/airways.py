@@ -0,0 +1,148 @@
+import array
+import collections
+import functools
+import math
+import sys
+import time
+from loguru import logger
+
+AIRWAY_SOURCES = ['routes', 'high_routes']
+COORDINATE_COLUMNS = ['start_latitude_deg', 'start_longitude_deg', 'end_latitude_deg', 'end_longitude_deg']
+
+
+class AirwayGraph:
+    """
+    Adjacency graph of every airway, built once from the routes and high_routes tables.
+
+    Fixes are numbered nodes with coordinates in flat arrays. Each airway keeps its
+    adjacency in CSR form: ``offsets[n]:offsets[n + 1]`` slices ``neighbours`` for local node n.
+
+    Initiates:
+        names: node number: fix ident.
+        latitudes, longitudes: node number: coordinate, NaN when unknown.
+        airways: airway ident: [nodes, offsets, neighbours] arrays.
+    """
+    def __init__(self, cache_size=4096):
+        self.names = []
+        self.latitudes = array.array('d')
+        self.longitudes = array.array('d')
+        self.airways = {}
+        self.build_seconds = None
+        self.expand_segment = functools.lru_cache(maxsize=cache_size)(self._expand_segment)
+
+    def _node(self, nodes, ident, latitude, longitude):
+        # Same ident at a different place is a different fix.
+        if latitude is None or longitude is None:
+            key = (ident, None, None)
+        else:
+            key = (ident, round(float(latitude), 4), round(float(longitude), 4))
+
+        node = nodes.get(key)
+        if node is None:
+            node = nodes[key] = len(self.names)
+            self.names.append(sys.intern(ident))
+            self.latitudes.append(math.nan if key[1] is None else key[1])
+            self.longitudes.append(math.nan if key[2] is None else key[2])
+
+        return node
+
+    async def build(self, db, tables):
+        """Load every airway segment.
+
+        Args:
+            db (aiosqlite.Connection): Open connection to the navdata database.
+            tables (Set): Tables present in the database.
+        """
+        started = time.perf_counter()
+        nodes = {}
+        edges = collections.defaultdict(lambda: collections.defaultdict(set))
+        for table in AIRWAY_SOURCES:
+            if table not in tables:
+                continue
+
+            async with db.execute(f'PRAGMA table_info({table})') as cursor:
+                columns = {row['name'] for row in await cursor.fetchall()}
+            if 'end_ident' not in columns:
+                logger.warning(f'{table} has no end_ident column, airways cannot be expanded.')
+                continue
+
+            coordinates = [column if column in columns else 'NULL' for column in COORDINATE_COLUMNS]
+            query = f'SELECT ident, start_ident, end_ident, {", ".join(coordinates)} FROM {table}'
+            async with db.execute(query) as cursor:
+                rows = await cursor.fetchall()
+
+            for ident, start_ident, end_ident, start_lat, start_lon, end_lat, end_lon in rows:
+                if not ident or not start_ident or not end_ident:
+                    continue
+                start = self._node(nodes, start_ident, start_lat, start_lon)
+                end = self._node(nodes, end_ident, end_lat, end_lon)
+                edges[ident][start].add(end)
+                edges[ident][end].add(start)
+
+        for ident, adjacency in edges.items():
+            local_nodes = array.array('i', sorted(adjacency))
+            local_index = {node: index for index, node in enumerate(local_nodes)}
+            offsets = array.array('i', [0])
+            neighbours = array.array('i')
+            for node in local_nodes:
+                neighbours.extend(sorted(local_index[neighbour] for neighbour in adjacency[node]))
+                offsets.append(len(neighbours))
+            self.airways[sys.intern(ident)] = [local_nodes, offsets, neighbours]
+
+        self.expand_segment.cache_clear()
+        self.build_seconds = time.perf_counter() - started
+        logger.info(f'Airway graph: {len(self.airways)} airways, {len(self.names)} fixes, built in {self.build_seconds:.2f} s')
+
+    def _expand_segment(self, airway, entry, exit):
+        """ Node numbers strictly between entry and exit along the airway, None when not connected. """
+        graph = self.airways.get(airway)
+        if not graph:
+            return None
+
+        local_nodes, offsets, neighbours = graph
+        names = self.names
+        starts = [index for index, node in enumerate(local_nodes) if names[node] == entry]
+        if not starts:
+            return None
+
+        # Breadth first, fewest segments wins when an ident shows up more than once.
+        previous = {start: None for start in starts}
+        queue = collections.deque(starts)
+        while queue:
+            current = queue.popleft()
+            if names[local_nodes[current]] == exit and previous[current] is not None:
+                path = []
+                step = previous[current]
+                while previous[step] is not None:
+                    path.append(local_nodes[step])
+                    step = previous[step]
+                path.reverse()
+                return tuple(path)
+
+            for neighbour in neighbours[offsets[current]:offsets[current + 1]]:
+                if neighbour not in previous:
+                    previous[neighbour] = current
+                    queue.append(neighbour)
+
+        return None
+
+    def expand(self, airway, entry, exit):
+        """Fixes flown along an airway between two of its fixes.
+
+        Returns:
+            List: [{'name', 'latitude', 'longitude'}] excluding entry and exit, None when the
+                airway does not connect them.
+        """
+        path = self.expand_segment(airway, entry, exit)
+        if path is None:
+            return None
+
+        fixes = []
+        for node in path:
+            fix = {'name': self.names[node]}
+            if not math.isnan(self.latitudes[node]):
+                fix['latitude'] = self.latitudes[node]
+                fix['longitude'] = self.longitudes[node]
+            fixes.append(fix)
+
+        return fixes
@@ -0,0 +1,58 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Set membership filter with no false negatives.
+
+    ``ident in bloom`` being False means the ident is certainly unknown,
+    True means it is probably known, wrong at about ``error_rate`` of the time.
+
+    Initiates:
+        capacity: number of items the filter is sized for.
+        error_rate: target false positive rate at capacity.
+        size_bits: length of the bit array.
+        hash_count: number of bit positions set per item.
+    """
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size_bits / capacity * math.log(2))))
+        self.count = 0
+        self._bits = bytearray((self.size_bits + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + index * second) % self.size_bits for index in range(self.hash_count)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self._bits
+        for position in self._positions(item):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    @property
+    def size_bytes(self):
+        return len(self._bits)
+
+    def expected_error_rate(self):
+        """ False positive rate for the number of items actually added. """
+        return (1 - math.exp(-self.hash_count * self.count / self.size_bits)) ** self.hash_count
+
+    def report(self):
+        return (
+            f'Ident filter: {self.count} idents, {self.size_bytes / 1024:.1f} KiB, '
+            f'{self.hash_count} hashes, false positive rate {self.expected_error_rate():.4f} '
+            f'(target {self.error_rate})'
+        )
@@ -0,0 +1,359 @@
+import re
+import numpy
+
+LATITUDE = 'latitude'
+LONGITUDE = 'longitude'
+
+# Positive and negative hemisphere letter of each axis.
+HEMISPHERES = {LATITUDE: 'NS', LONGITUDE: 'EW'}
+DEGREE_DIGITS = {LATITUDE: 2, LONGITUDE: 3}
+LIMITS = {LATITUDE: 90, LONGITUDE: 180}
+
+# ARINC 424 five character waypoint letters: (latitude sign, longitude sign).
+ARINC_QUADRANTS = {'N': (1, -1), 'E': (1, 1), 'S': (-1, 1), 'W': (-1, -1)}
+ARINC_LETTERS = {signs: letter for letter, signs in ARINC_QUADRANTS.items()}
+
+DECIMAL_PATTERN = re.compile(r'^[+-]?(\d+(\.\d*)?|\.\d+)$')
+
+
+def axis_patterns(axis):
+    digits = DEGREE_DIGITS[axis]
+    hemispheres = HEMISPHERES[axis]
+    return [
+        # Hemisphere last: 50N, 5030N, 503000N, 0503000.5W
+        re.compile(
+            rf'^(?P<degrees>\d{{{digits}}})(?:(?P<minutes>\d{{2}})(?P<seconds>\d{{2}}(?:\.\d+)?)?)?'
+            rf'(?P<hemisphere>[{hemispheres}])$'
+        ),
+        # ARINC 424 record field, hemisphere first, seconds in hundredths: N50300000, W030000000
+        re.compile(
+            rf'^(?P<hemisphere>[{hemispheres}])(?P<degrees>\d{{{digits}}})(?P<minutes>\d{{2}})(?P<hundredths>\d{{4}})$'
+        )
+    ]
+
+
+AXIS_PATTERNS = {axis: axis_patterns(axis) for axis in [LATITUDE, LONGITUDE]}
+
+# ICAO flight plan positions, latitude and longitude at the same precision: 46N050W, 4600N05000W, 460000N0500000W
+POSITION_PATTERNS = [
+    re.compile(r'^(?P<latitude>\d{2})(?P<lat_hemisphere>[NS])(?P<longitude>\d{2,3})(?P<lon_hemisphere>[EW])$'),
+    re.compile(r'^(?P<latitude>\d{4})(?P<lat_hemisphere>[NS])(?P<longitude>\d{5})(?P<lon_hemisphere>[EW])$'),
+    re.compile(r'^(?P<latitude>\d{6})(?P<lat_hemisphere>[NS])(?P<longitude>\d{7})(?P<lon_hemisphere>[EW])$')
+]
+
+# ARINC 424 whole degree waypoints, letter last below 100 degrees of longitude (5030N), in the middle from 100 on (50N30).
+ARINC_PATTERN = re.compile(r'^(?P<latitude>\d{2})(?:(?P<letter>[NESW])(?P<high_longitude>\d{2})|(?P<longitude>\d{2})(?P<low_letter>[NESW]))$')
+
+
+class CoordinateError(ValueError):
+    pass
+
+
+def degrees(whole, minutes=0, seconds=0.0, sign=1):
+    """ Signed decimal degrees, the hemisphere sign applies to the whole value. """
+    if minutes >= 60 or seconds >= 60:
+        raise CoordinateError(f'Minutes and seconds must be below 60, got {minutes} and {seconds}')
+    return sign * (whole + minutes / 60 + seconds / 3600)
+
+
+def checked(value, axis, text):
+    if not -LIMITS[axis] <= value <= LIMITS[axis]:
+        raise CoordinateError(f'{text!r} is outside the {axis} range')
+    return value
+
+
+def decode(text, axis):
+    """Read one latitude or longitude in any supported form.
+
+    Args:
+        text (str): Decimal degrees, DMS with the hemisphere last or an ARINC 424 record field.
+        axis (str): LATITUDE or LONGITUDE.
+
+    Returns:
+        float: Signed decimal degrees.
+    """
+    text = str(text).strip().upper()
+    if DECIMAL_PATTERN.match(text):
+        return checked(float(text), axis, text)
+
+    for pattern in AXIS_PATTERNS[axis]:
+        match = pattern.match(text)
+        if match:
+            parts = match.groupdict()
+            seconds = float(parts['seconds'] or 0) if 'seconds' in parts else int(parts['hundredths']) / 100
+            sign = 1 if parts['hemisphere'] == HEMISPHERES[axis][0] else -1
+            value = degrees(int(parts['degrees']), int(parts['minutes'] or 0), seconds, sign)
+            return checked(value, axis, text)
+
+    raise CoordinateError(f'{text!r} is not a {axis}')
+
+
+def decode_latitude(text):
+    return decode(text, LATITUDE)
+
+
+def decode_longitude(text):
+    return decode(text, LONGITUDE)
+
+
+def split_dms(digits, degree_digits):
+    """ Degrees, minutes and seconds of a run of digits, minutes and seconds being optional. """
+    return [int(digits[:degree_digits]), int(digits[degree_digits:degree_digits + 2] or 0), int(digits[degree_digits + 2:] or 0)]
+
+
+def decode_position(text):
+    """Read a position written as a single route token.
+
+    Args:
+        text (str): ICAO form (46N050W, 4600N05000W, 460000N0500000W) or ARINC 424 (5030N, 50N30).
+
+    Returns:
+        Tuple: (latitude, longitude) in signed decimal degrees.
+    """
+    text = str(text).strip().upper()
+    for pattern in POSITION_PATTERNS:
+        match = pattern.match(text)
+        if match:
+            parts = match.groupdict()
+            longitude_digits = 2 if len(parts['longitude']) == 2 else 3
+            latitude = degrees(*split_dms(parts['latitude'], 2), 1 if parts['lat_hemisphere'] == 'N' else -1)
+            longitude = degrees(*split_dms(parts['longitude'], longitude_digits), 1 if parts['lon_hemisphere'] == 'E' else -1)
+            return (checked(latitude, LATITUDE, text), checked(longitude, LONGITUDE, text))
+
+    match = ARINC_PATTERN.match(text)
+    if match:
+        parts = match.groupdict()
+        if parts['letter']:
+            latitude_sign, longitude_sign = ARINC_QUADRANTS[parts['letter']]
+            longitude = 100 + int(parts['high_longitude'])
+        else:
+            latitude_sign, longitude_sign = ARINC_QUADRANTS[parts['low_letter']]
+            longitude = int(parts['longitude'])
+        return (
+            checked(float(latitude_sign * int(parts['latitude'])), LATITUDE, text),
+            checked(float(longitude_sign * longitude), LONGITUDE, text)
+        )
+
+    raise CoordinateError(f'{text!r} is not a position')
+
+
+def dms_parts(value, axis, unit=1):
+    """ Whole degrees, minutes and seconds / ``unit`` of a value, rounded once so carries are never lost. """
+    if value is None or value != value or abs(value) > LIMITS[axis]:
+        raise CoordinateError(f'{value!r} is not a {axis}')
+    total = round(abs(value) * 3600 * unit)
+    whole, rest = divmod(total, 3600 * unit)
+    minutes, seconds = divmod(rest, 60 * unit)
+    hemisphere = HEMISPHERES[axis][0 if value >= 0 else 1]
+    return [whole, minutes, seconds, hemisphere]
+
+
+def encode_decimal(value, precision=6):
+    return f'{value:.{precision}f}'
+
+
+def encode_dms(value, axis):
+    """ DDMMSSH for latitudes, DDDMMSSH for longitudes. """
+    whole, minutes, seconds, hemisphere = dms_parts(value, axis)
+    return f'{whole:0{DEGREE_DIGITS[axis]}d}{minutes:02d}{seconds:02d}{hemisphere}'
+
+
+def encode_arinc424(value, axis):
+    """ ARINC 424 record field, N50300000 for latitudes and W030000000 for longitudes. """
+    whole, minutes, hundredths, hemisphere = dms_parts(value, axis, unit=100)
+    return f'{hemisphere}{whole:0{DEGREE_DIGITS[axis]}d}{minutes:02d}{hundredths:04d}'
+
+
+def encode_icao(latitude, longitude, minutes=True):
+    """ ICAO flight plan position, 4600N05000W or with ``minutes=False`` 46N050W. """
+    if not minutes:
+        lat_degrees, _, _, lat_hemisphere = dms_parts(round(latitude), LATITUDE)
+        lon_degrees, _, _, lon_hemisphere = dms_parts(round(longitude), LONGITUDE)
+        return f'{lat_degrees:02d}{lat_hemisphere}{lon_degrees:03d}{lon_hemisphere}'
+
+    lat_degrees, lat_minutes, _, lat_hemisphere = dms_parts(round(latitude * 60) / 60, LATITUDE)
+    lon_degrees, lon_minutes, _, lon_hemisphere = dms_parts(round(longitude * 60) / 60, LONGITUDE)
+    return f'{lat_degrees:02d}{lat_minutes:02d}{lat_hemisphere}{lon_degrees:03d}{lon_minutes:02d}{lon_hemisphere}'
+
+
+def encode_arinc(latitude, longitude):
+    """ ARINC 424 five character name of a whole degree position, 5030N or 50N30. """
+    if latitude != int(latitude) or longitude != int(longitude):
+        raise CoordinateError(f'({latitude}, {longitude}) is not a whole degree position')
+    checked(latitude, LATITUDE, latitude)
+    checked(longitude, LONGITUDE, longitude)
+
+    letter = ARINC_LETTERS[(1 if latitude >= 0 else -1, 1 if longitude >= 0 else -1)]
+    latitude = abs(int(latitude))
+    longitude = abs(int(longitude))
+    if longitude >= 100:
+        return f'{latitude:02d}{letter}{longitude - 100:02d}'
+    return f'{latitude:02d}{longitude:02d}{letter}'
+
+
+# Fixed width forms the batch decoder handles without Python level work per value:
+# (length, hemisphere column, [(first digit, end, divisor, limit)]).
+BATCH_LAYOUTS = {
+    LATITUDE: [
+        (3, 2, [(0, 2, 1, 91)]),
+        (5, 4, [(0, 2, 1, 91), (2, 4, 60, 60)]),
+        (7, 6, [(0, 2, 1, 91), (2, 4, 60, 60), (4, 6, 3600, 60)]),
+        (9, 0, [(1, 3, 1, 91), (3, 5, 60, 60), (5, 9, 360000, 6000)])
+    ],
+    LONGITUDE: [
+        (4, 3, [(0, 3, 1, 181)]),
+        (6, 5, [(0, 3, 1, 181), (3, 5, 60, 60)]),
+        (8, 7, [(0, 3, 1, 181), (3, 5, 60, 60), (5, 7, 3600, 60)]),
+        (10, 0, [(1, 4, 1, 181), (4, 6, 60, 60), (6, 10, 360000, 6000)])
+    ]
+}
+
+
+def as_characters(values):
+    """Upper case ASCII of every value as a (n, width) uint8 matrix.
+
+    Returns:
+        List: [characters, length of each value, values as a bytes array]
+    """
+    try:
+        encoded = numpy.asarray(values, dtype=bytes)
+    except UnicodeEncodeError:
+        encoded = numpy.char.encode(numpy.asarray(values, dtype=str), 'ascii', 'replace')
+    encoded = encoded.reshape(-1)
+    width = max(encoded.dtype.itemsize, 1)
+    characters = numpy.frombuffer(encoded.astype(f'S{width}').tobytes(), dtype=numpy.uint8).reshape(-1, width)
+    lowercase = (characters >= ord('a')) & (characters <= ord('z'))
+    characters = numpy.where(lowercase, characters - 32, characters).astype(numpy.uint8)
+    return [characters, (characters != 0).sum(axis=1), encoded]
+
+
+def digit_value(characters, start, end):
+    digits = characters[:, start:end].astype(numpy.int64) - ord('0')
+    valid = ((digits >= 0) & (digits <= 9)).all(axis=1)
+    weights = 10 ** numpy.arange(end - start - 1, -1, -1, dtype=numpy.int64)
+    return digits @ weights, valid
+
+
+def decode_fixed(characters, layout, axis):
+    """Convert rows which are all in one fixed width layout.
+
+    Returns:
+        List: [signed degrees, valid] arrays, one entry per row.
+    """
+    length, hemisphere_column, fields = layout
+    positive, negative = (ord(letter) for letter in HEMISPHERES[axis])
+    hemisphere = characters[:, hemisphere_column]
+    valid = (hemisphere == positive) | (hemisphere == negative)
+    value = numpy.zeros(len(characters))
+    for start, end, divisor, limit in fields:
+        field, digits_valid = digit_value(characters, start, end)
+        valid &= digits_valid & (field < limit)
+        value += field / divisor
+    value = numpy.where(hemisphere == positive, value, -value)
+    valid &= numpy.abs(value) <= LIMITS[axis]
+    return [value, valid]
+
+
+def decode_array(values, axis):
+    """Batch version of ``decode`` for importers.
+
+    Fixed width DMS and ARINC 424 forms and plain decimals are converted with array
+    operations, anything else falls back to ``decode`` one value at a time.
+
+    Returns:
+        numpy.ndarray: Signed decimal degrees, NaN where a value could not be read.
+    """
+    characters, lengths, encoded = as_characters(values)
+    result = numpy.full(len(encoded), numpy.nan)
+    done = numpy.zeros(len(encoded), dtype=bool)
+
+    for layout in BATCH_LAYOUTS[axis]:
+        length = layout[0]
+        rows = numpy.flatnonzero(lengths == length)
+        if not len(rows):
+            continue
+        value, valid = decode_fixed(characters[rows, :length], layout, axis)
+        result[rows[valid]] = value[valid]
+        done[rows[valid]] = True
+
+    # Plain decimals in one conversion when they all parse.
+    remaining = numpy.flatnonzero(~done)
+    if len(remaining):
+        try:
+            decimals = encoded[remaining].astype(numpy.float64)
+        except ValueError:
+            decimals = None
+        if decimals is not None:
+            valid = numpy.abs(decimals) <= LIMITS[axis]
+            result[remaining[valid]] = decimals[valid]
+            done[remaining] = True
+
+    for index in numpy.flatnonzero(~done):
+        try:
+            result[index] = decode(encoded[index].decode('ascii', 'replace'), axis)
+        except CoordinateError:
+            pass
+
+    return result
+
+
+def decode_latitudes(values):
+    return decode_array(values, LATITUDE)
+
+
+def decode_longitudes(values):
+    return decode_array(values, LONGITUDE)
+
+
+def decode_positions(values):
+    """Batch version of ``decode_position``.
+
+    Returns:
+        numpy.ndarray: (n, 2) latitude and longitude, NaN where a value is not a position.
+    """
+    characters, lengths, encoded = as_characters(values)
+    result = numpy.full((len(encoded), 2), numpy.nan)
+    done = numpy.zeros(len(encoded), dtype=bool)
+
+    # ICAO forms are a hemisphere last latitude followed by a longitude of the same precision.
+    for latitude_layout, longitude_layout in zip(BATCH_LAYOUTS[LATITUDE][:3], BATCH_LAYOUTS[LONGITUDE][:3]):
+        split = latitude_layout[0]
+        length = split + longitude_layout[0]
+        rows = numpy.flatnonzero(lengths == length)
+        if not len(rows):
+            continue
+        latitudes, latitudes_valid = decode_fixed(characters[rows, :split], latitude_layout, LATITUDE)
+        longitudes, longitudes_valid = decode_fixed(characters[rows, split:length], longitude_layout, LONGITUDE)
+        valid = latitudes_valid & longitudes_valid
+        result[rows[valid], 0] = latitudes[valid]
+        result[rows[valid], 1] = longitudes[valid]
+        done[rows[valid]] = True
+
+    for index in numpy.flatnonzero(~done):
+        try:
+            result[index] = decode_position(encoded[index].decode('ascii', 'replace'))
+        except CoordinateError:
+            pass
+
+    return result
+
+
+def encode_dms_array(values, axis):
+    """Batch version of ``encode_dms``.
+
+    Returns:
+        numpy.ndarray: DMS strings, empty where a value is NaN or out of range.
+    """
+    values = numpy.asarray(values, dtype=numpy.float64)
+    with numpy.errstate(invalid='ignore'):
+        valid = numpy.abs(values) <= LIMITS[axis]
+    total = numpy.rint(numpy.abs(numpy.where(valid, values, 0)) * 3600).astype(numpy.int64)
+    whole, rest = numpy.divmod(total, 3600)
+    minutes, seconds = numpy.divmod(rest, 60)
+    hemisphere = numpy.where(values >= 0, HEMISPHERES[axis][0], HEMISPHERES[axis][1])
+
+    encoded = numpy.char.zfill(whole.astype(str), DEGREE_DIGITS[axis])
+    encoded = numpy.char.add(encoded, numpy.char.zfill(minutes.astype(str), 2))
+    encoded = numpy.char.add(encoded, numpy.char.zfill(seconds.astype(str), 2))
+    encoded = numpy.char.add(encoded, hemisphere)
+    return numpy.where(valid, encoded, '')
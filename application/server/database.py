@@ -1,53 +1,482 @@
+import asyncio
+import contextlib
+import json
+import os
+import pathlib
 import aiosqlite
+from loguru import logger
+from server.navdata import NavdataIndex
+from server.snapshot import open_snapshot
+from server.cache import LookupCache, MISSING
+from server.bloom import BloomFilter
+from server.airways import AirwayGraph, AIRWAY_SOURCES
+
+POOL_SIZE = 4
+
+# Connections are only ever used for lookups, tune them for read heavy use.
+READ_ONLY_PRAGMAS = [
+    'PRAGMA query_only = ON',
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA temp_store = MEMORY'
+]
+
+# Tables that can resolve a route ident, in the order they take precedence.
+IDENT_SOURCES = {
+    'waypoint': 'waypoints',
+    'navaid': 'navaids',
+    'route': 'routes',
+    'high_route': 'high_routes'
+}
+
+# Columns every candidate row carries regardless of its source table.
+CANDIDATE_COLUMNS = {
+    'waypoint': 'ident, latitude_deg, longitude_deg, NULL AS start_ident',
+    'navaid': 'ident, latitude_deg, longitude_deg, NULL AS start_ident',
+    'route': 'ident, NULL AS latitude_deg, NULL AS longitude_deg, start_ident',
+    'high_route': 'ident, NULL AS latitude_deg, NULL AS longitude_deg, start_ident'
+}
+
+# Per airport detail tables returned with airport lookups, as payload key: (table, columns).
+AIRPORT_DETAILS = {
+    'runways': ('runways', [
+        'length_ft', 'width_ft', 'surface', 'lighted', 'closed',
+        'le_ident', 'le_latitude_deg', 'le_longitude_deg', 'le_elevation_ft', 'le_heading_degT', 'le_displaced_threshold_ft',
+        'he_ident', 'he_latitude_deg', 'he_longitude_deg', 'he_elevation_ft', 'he_heading_degT', 'he_displaced_threshold_ft'
+    ]),
+    'frequencies': ('airport_frequencies', ['type', 'description', 'frequency_mhz'])
+}
+
 
 
 class Database:
-    def __init__(self):
-        self.database = 'data.db'
-        pass
+    """
+    Owns a bounded pool of long lived read-only connections to the navdata database.
+
+    Initiates:
+        database: path of the SQLite database file.
+        pool_size: number of connections kept open while the pool is open.
+        resident: serve ident and airport lookups from an in-memory ``NavdataIndex``
+            built when the pool opens, instead of querying SQLite.
+        snapshot: path of the binary fix snapshot written by the navdata builder. Waypoint and
+            navaid candidates are read from it when it matches the database build id.
+            Defaults to the database path with a ``.snap`` extension.
+        cache_size: number of ident and airport lookups kept in the ``LookupCache``.
+        cache_ttl: seconds a cached lookup stays valid, ``None`` to keep until evicted.
+        filter_error_rate: false positive rate of the ``BloomFilter`` over every known ident, checked
+            before any lookup so unknown idents cost no query. ``None`` disables the filter.
+    """
+    def __init__(self, database='data.db', pool_size=POOL_SIZE, resident=False, snapshot=None, cache_size=4096, cache_ttl=None,
+                 filter_error_rate=0.01):
+        self.database = database
+        self.pool_size = pool_size
+        self.resident = resident
+        self.snapshot_path = snapshot or str(pathlib.Path(database).with_suffix('.snap'))
+        self.index = None
+        self.snapshot = None
+        self.airways = None
+        self.build_id = None
+        self.cache = LookupCache(cache_size, cache_ttl)
+        self.filter_error_rate = filter_error_rate
+        self.ident_filter = None
+        self._data_version = None
+        self._pool = None
+        self._connections = []
+        self._open_lock = None
+        self.tables = set()
+
+    async def open(self):
+        """ Open all pooled connections. Safe to call more than once. """
+        if self._open_lock is None:
+            self._open_lock = asyncio.Lock()
+
+        async with self._open_lock:
+            if self._pool is not None:
+                return
+
+            pool = asyncio.Queue(maxsize=self.pool_size)
+            try:
+                for _ in range(self.pool_size):
+                    db = await self._connect()
+                    self._connections.append(db)
+                    pool.put_nowait(db)
+
+                self._data_version = self.data_version()
+                await self._load_navdata(self._connections[0])
+            except BaseException:
+                await self.close()
+                raise
+
+            self._pool = pool
+            logger.debug(f'Database pool opened with {self.pool_size} connections to {self.database}')
+
+    async def close(self):
+        """ Close all pooled connections. """
+        connections = self._connections
+        self._pool = None
+        self._connections = []
+        self.index = None
+        self.airways = None
+        self.ident_filter = None
+        if self.snapshot:
+            self.snapshot.close()
+            self.snapshot = None
+        for db in connections:
+            await db.close()
+
+    async def _connect(self):
+        uri = f'{pathlib.Path(self.database).resolve().as_uri()}?mode=ro'
+        db = await aiosqlite.connect(uri, uri=True)
+        db.row_factory = aiosqlite.Row
+        for pragma in READ_ONLY_PRAGMAS:
+            await db.execute(pragma)
+
+        return db
+
+    async def _read_build(self, db):
+        """Build information stamped by the navdata builder.
+
+        Returns:
+            Dict: build_id, parent_build_id and changed, a {table: set of idents} of the rows
+                changed since the parent build. changed is None when unknown.
+        """
+        build = {'build_id': None, 'parent_build_id': None, 'changed': None}
+        if 'meta' not in self.tables:
+            return build
+
+        async with db.execute('SELECT key, value FROM meta') as cursor:
+            for row in await cursor.fetchall():
+                if row['key'] in build:
+                    build[row['key']] = row['value']
+
+        if build['parent_build_id'] and 'changed_idents' in self.tables:
+            changed = {}
+            async with db.execute('SELECT table_name, ident FROM changed_idents') as cursor:
+                for row in await cursor.fetchall():
+                    changed.setdefault(row['table_name'], set()).add(row['ident'])
+            build['changed'] = changed
+
+        return build
+
+    async def _read_tables(self, db):
+        async with db.execute("SELECT name FROM sqlite_master WHERE type='table'") as cursor:
+            self.tables = {row['name'] for row in await cursor.fetchall()}
+
+    async def _load_navdata(self, db):
+        """ Load everything derived from the database content. """
+        await self._read_tables(db)
+        self.build_id = (await self._read_build(db))['build_id']
+
+        self.airways = None
+        if any(table in self.tables for table in AIRWAY_SOURCES):
+            self.airways = AirwayGraph()
+            await self.airways.build(db, self.tables)
+
+        if self.resident:
+            self.index = NavdataIndex()
+            await self.index.build(db, self.tables, IDENT_SOURCES, CANDIDATE_COLUMNS, AIRPORT_DETAILS)
+        else:
+            self._reopen_snapshot()
+            if self.filter_error_rate:
+                await self._build_ident_filter(db)
+
+    def _reopen_snapshot(self):
+        if self.snapshot:
+            self.snapshot.close()
+        self.snapshot = open_snapshot(self.snapshot_path, self.build_id)
+
+    async def check_data_version(self):
+        """Pick up changes made to the database since it was loaded.
+
+        After an incremental update of the loaded build only the changed idents are dropped
+        from the cache and added to the ident filter. Anything else reloads every derived
+        structure. A database file replaced by a staged rebuild also gets fresh connections.
+        """
+        if self._pool is None:
+            await self.open()
+
+        version = self.data_version()
+        if version == self._data_version or version[0] is None:
+            return
+
+        async with self._open_lock:
+            if version == self._data_version:
+                return
+
+            if self._data_version[0] is None or version[0][2] != self._data_version[0][2]:
+                await self._reopen_connections()
+
+            previous_build_id = self.build_id
+            async with self.connection() as db:
+                await self._read_tables(db)
+                build = await self._read_build(db)
+                if build['build_id'] == previous_build_id:
+                    # Same data, the snapshot may have been written since.
+                    if not self.resident:
+                        self._reopen_snapshot()
+                elif previous_build_id and build['parent_build_id'] == previous_build_id and build['changed'] is not None:
+                    logger.info(f'Navdata updated to build {build["build_id"]}, dropping changed idents only.')
+                    self.build_id = build['build_id']
+                    changed_idents = set().union(*build['changed'].values())
+                    for ident in changed_idents:
+                        self.cache.discard(('ident', ident))
+                        self.cache.discard(('airport', ident))
+                        self.cache.discard(('airport_details', ident))
+                    if self.resident:
+                        await self._load_navdata(db)
+                    else:
+                        self._reopen_snapshot()
+                        if self.ident_filter:
+                            for ident in changed_idents:
+                                self.ident_filter.add(ident)
+                        if any(table in build['changed'] for table in AIRWAY_SOURCES):
+                            self.airways = AirwayGraph()
+                            await self.airways.build(db, self.tables)
+                else:
+                    logger.info(f'Navdata rebuilt as build {build["build_id"]}, reloading.')
+                    self.cache.clear()
+                    await self._load_navdata(db)
+
+            self._data_version = version
+
+    async def _reopen_connections(self):
+        """Point the pool at a database file swapped in by a rebuild.
+
+        Idle connections are closed right away, borrowed ones once they are returned,
+        so lookups in flight finish against the file they started on.
+        """
+        retired = self._pool
+        pool = asyncio.Queue(maxsize=self.pool_size)
+        for _ in range(self.pool_size):
+            db = await self._connect()
+            self._connections.append(db)
+            pool.put_nowait(db)
+        self._pool = pool
+
+        while not retired.empty():
+            db = retired.get_nowait()
+            self._connections.remove(db)
+            await db.close()
+        logger.info(f'Database {self.database} was replaced, reopened {self.pool_size} connections.')
+
+    async def _build_ident_filter(self, db):
+        selects = [f'SELECT ident FROM {table}' for table in IDENT_SOURCES.values() if table in self.tables]
+        idents = []
+        if selects:
+            async with db.execute(' UNION '.join(selects)) as cursor:
+                idents = [row['ident'] for row in await cursor.fetchall() if row['ident']]
+
+        ident_filter = BloomFilter(len(idents), self.filter_error_rate)
+        for ident in idents:
+            ident_filter.add(ident)
+
+        self.ident_filter = ident_filter
+        logger.info(ident_filter.report())
+
+    def data_version(self):
+        """ Changes whenever the database or its snapshot are written. """
+        version = []
+        for path in [self.database, self.snapshot_path]:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                version.append(None)
+                continue
+            version.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+
+        return tuple(version)
+
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        """ Borrow a connection from the pool, opening the pool on first use. """
+        if self._pool is None:
+            await self.open()
+
+        pool = self._pool
+        db = await pool.get()
+        try:
+            yield db
+        finally:
+            if pool is self._pool:
+                pool.put_nowait(db)
+            elif db in self._connections:
+                # Borrowed before the database file was swapped, retire it.
+                self._connections.remove(db)
+                await db.close()
 
     async def airports(self):
-        async with aiosqlite.connect(self.database) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.connection() as db:
             async with db.execute('SELECT * FROM airports') as cursor:
                 return dict(await cursor.fetchone())
 
     async def airport_from_ident(self, ident):
-        async with aiosqlite.connect(self.database) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute('SELECT * FROM airports WHERE ident=?', (ident, )) as cursor:
-                airport = await cursor.fetchone()
+        await self.check_data_version()
+        if self.index:
+            return self.index.airport_from_ident(ident)
+
+        airport = self.cache.get(('airport', ident))
+        if airport is MISSING:
+            async with self.connection() as db:
+                async with db.execute('SELECT * FROM airports WHERE ident=?', (ident, )) as cursor:
+                    airport = await cursor.fetchone()
+            self.cache.set(('airport', ident), airport)
+
+        if airport:
+            return dict(airport)
+
+    async def airports_from_idents(self, idents):
+        """Fetch several airports with their runways and frequencies in one query.
+
+        Args:
+            idents (Iterable): Airport idents.
+
+        Returns:
+            Dict: {ident: airport} where each airport dict carries ``runways`` and ``frequencies``
+                lists. Unknown idents are left out.
+        """
+        idents = list(set(idents))
+        if not idents:
+            return {}
+
+        await self.check_data_version()
+        if self.index:
+            return self.index.airports_from_idents(idents)
+
+        airports = {}
+        to_fetch = []
+        for ident in idents:
+            airport = self.cache.get(('airport_details', ident))
+            if airport is MISSING:
+                to_fetch.append(ident)
+            elif airport:
+                airports[ident] = dict(airport)
+
+        if to_fetch:
+            details = []
+            for key, (table, columns) in AIRPORT_DETAILS.items():
+                if table not in self.tables:
+                    details.append(f"'[]' AS {key}")
+                    continue
+                fields = ', '.join(f"'{column}', {column}" for column in columns)
+                details.append(
+                    f'(SELECT json_group_array(json_object({fields})) FROM {table} '
+                    f'WHERE airport_ident = airports.ident) AS {key}'
+                )
+
+            query = f"SELECT *, {', '.join(details)} FROM airports WHERE ident IN (SELECT value FROM json_each(?))"
+            async with self.connection() as db:
+                async with db.execute(query, (json.dumps(to_fetch), )) as cursor:
+                    rows = await cursor.fetchall()
+
+            fetched = {}
+            for row in rows:
+                airport = dict(row)
+                for key in AIRPORT_DETAILS:
+                    airport[key] = json.loads(airport[key])
+                fetched.setdefault(airport['ident'], airport)
+
+            for ident in to_fetch:
+                airport = fetched.get(ident)
+                self.cache.set(('airport_details', ident), airport)
                 if airport:
-                    return dict(airport)
+                    airports[ident] = dict(airport)
+
+        return airports
 
     async def navaid_from_ident(self, ident):
-        async with aiosqlite.connect(self.database) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.connection() as db:
             async with db.execute('SELECT * FROM navaids WHERE ident=?', (ident, )) as cursor:
                 navaid = await cursor.fetchall()
                 if navaid:
                     return navaid
 
     async def waypoint_from_ident(self, ident):
-        async with aiosqlite.connect(self.database) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.connection() as db:
             async with db.execute('SELECT * FROM waypoints WHERE ident=?', (ident, )) as cursor:
                 waypoint = await cursor.fetchall()
                 if waypoint:
                     return waypoint
 
     async def route_from_ident(self, ident):
-        async with aiosqlite.connect(self.database) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.connection() as db:
             async with db.execute('SELECT * FROM routes WHERE ident=?', (ident, )) as cursor:
                 route = await cursor.fetchall()
                 if route:
                     return route
 
     async def high_route_from_ident(self, ident):
-        async with aiosqlite.connect(self.database) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.connection() as db:
             async with db.execute('SELECT * FROM high_routes WHERE ident=?', (ident, )) as cursor:
                 high_route = await cursor.fetchall()
                 if high_route:
                     return high_route
+
+    async def resolve_idents(self, idents):
+        """Fetch candidates for many route idents from all ident tables in one query.
+
+        Args:
+            idents (Iterable): Route idents to resolve.
+
+        Returns:
+            Dict: {ident: {source: [rows]}} with sources ordered by IDENT_SOURCES precedence.
+                Idents without any match are left out.
+        """
+        idents = list(set(idents))
+        if not idents:
+            return {}
+
+        await self.check_data_version()
+        if self.index:
+            return self.index.resolve_idents(idents)
+
+        if self.ident_filter:
+            idents = [ident for ident in idents if ident in self.ident_filter]
+
+        resolved = {}
+        to_fetch = []
+        for ident in idents:
+            candidates = self.cache.get(('ident', ident))
+            if candidates is MISSING:
+                to_fetch.append(ident)
+            elif candidates:
+                resolved[ident] = candidates
+
+        if to_fetch:
+            fetched = await self._fetch_candidates(to_fetch)
+            for ident in to_fetch:
+                candidates = fetched.get(ident, {})
+                self.cache.set(('ident', ident), candidates)
+                if candidates:
+                    resolved[ident] = candidates
+
+        return resolved
+
+    async def _fetch_candidates(self, idents):
+        resolved = {}
+        sql_sources = IDENT_SOURCES
+        if self.snapshot:
+            resolved = self.snapshot.resolve_idents(idents)
+            sql_sources = {source: table for source, table in IDENT_SOURCES.items() if source not in self.snapshot.sources}
+
+        selects = []
+        for precedence, (source, table) in enumerate(IDENT_SOURCES.items()):
+            if source not in sql_sources or table not in self.tables:
+                continue
+            selects.append(
+                f"SELECT {precedence} AS precedence, rowid AS row_order, '{source}' AS source, {CANDIDATE_COLUMNS[source]} "
+                f"FROM {table} WHERE ident IN (SELECT value FROM json_each(?))"
+            )
+
+        if not selects:
+            return resolved
+
+        query = ' UNION ALL '.join(selects) + ' ORDER BY precedence, row_order'
+        idents_json = json.dumps(idents)
+        async with self.connection() as db:
+            async with db.execute(query, [idents_json] * len(selects)) as cursor:
+                rows = await cursor.fetchall()
+
+        for row in rows:
+            resolved.setdefault(row['ident'], {}).setdefault(row['source'], []).append(row)
+
+        return resolved
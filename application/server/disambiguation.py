@@ -0,0 +1,93 @@
+import numpy
+import server.geo
+
+
+def candidate_coordinates(points):
+    """Coordinates of the candidates which have them.
+
+    Returns:
+        List: [indexes, coordinates] where coordinates is a (k, 2) latitude/longitude array
+            and indexes maps its rows back to ``points``.
+    """
+    indexes = []
+    coordinates = []
+    for index, point in enumerate(points):
+        latitude = point['latitude_deg']
+        longitude = point['longitude_deg']
+        if latitude in ('', None) or longitude in ('', None):
+            continue
+        indexes.append(index)
+        coordinates.append((float(latitude), float(longitude)))
+
+    return [indexes, numpy.array(coordinates, dtype=float).reshape(-1, 2)]
+
+
+def shortest_path(candidates, start=None, end=None):
+    """Pick one candidate per step so the total great circle distance is the shortest.
+
+    Viterbi over the candidate sets, O(n * k^2). Candidate sets are padded to the same
+    size so the distances of every leg are computed in a single NumPy call.
+
+    Args:
+        candidates (List): (k, 2) latitude/longitude arrays, one per step, k >= 1.
+        start (Tuple): Optional (latitude, longitude) the path leaves from.
+        end (Tuple): Optional (latitude, longitude) the path arrives at.
+
+    Returns:
+        List: Chosen row index for every step.
+    """
+    if not candidates:
+        return []
+
+    width = max(len(step) for step in candidates)
+    padded = numpy.full((len(candidates), width, 2), numpy.nan)
+    for index, step in enumerate(candidates):
+        padded[index, :len(step)] = step
+
+    # legs[i, a, b]: step i candidate a to step i + 1 candidate b. Padding costs infinity.
+    legs = server.geo.great_circle_array_nm(
+        padded[:-1, :, None, 0], padded[:-1, :, None, 1], padded[1:, None, :, 0], padded[1:, None, :, 1]
+    )
+    legs = numpy.where(numpy.isnan(legs), numpy.inf, legs)
+
+    if start is not None:
+        cost = server.geo.great_circle_array_nm(start[0], start[1], padded[0, :, 0], padded[0, :, 1])
+    else:
+        cost = numpy.zeros(width)
+    cost = numpy.where(numpy.isnan(cost), numpy.inf, cost)
+    cost[len(candidates[0]):] = numpy.inf
+
+    columns = numpy.arange(width)
+    back_pointers = numpy.empty((len(candidates) - 1, width), dtype=numpy.intp)
+    for index in range(len(candidates) - 1):
+        total = cost[:, None] + legs[index]
+        best = total.argmin(axis=0)
+        back_pointers[index] = best
+        cost = total[best, columns]
+
+    if end is not None:
+        cost = cost + numpy.nan_to_num(
+            server.geo.great_circle_array_nm(padded[-1, :, 0], padded[-1, :, 1], end[0], end[1]), nan=numpy.inf
+        )
+
+    pick = int(cost.argmin())
+    path = [pick]
+    for best in back_pointers[::-1]:
+        pick = int(best[pick])
+        path.append(pick)
+
+    path.reverse()
+    return path
+
+
+def airport_position(airport):
+    """ (latitude, longitude) of an airport row, None when unknown. """
+    if not airport:
+        return None
+
+    latitude = airport.get('latitude_deg')
+    longitude = airport.get('longitude_deg')
+    if latitude in ('', None) or longitude in ('', None):
+        return None
+
+    return (float(latitude), float(longitude))
@@ -0,0 +1,54 @@
+import math
+import numpy
+
+EARTH_RADIUS_NM = 3440.065
+
+
+def great_circle_nm(lat1, lon1, lat2, lon2):
+    """ Haversine distance in nautical miles, ``None`` when any coordinate is missing. """
+    if lat1 is None or lon1 is None or lat2 is None or lon2 is None:
+        return None
+
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_NM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def great_circle_array_nm(lat1, lon1, lat2, lon2):
+    """ Haversine distance in nautical miles over NumPy arrays of degrees, broadcasting like any ufunc. """
+    phi1 = numpy.radians(lat1)
+    phi2 = numpy.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = numpy.radians(numpy.subtract(lon2, lon1))
+    a = numpy.sin(d_phi / 2) ** 2 + numpy.cos(phi1) * numpy.cos(phi2) * numpy.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_NM * numpy.arcsin(numpy.minimum(1.0, numpy.sqrt(a)))
+
+
+def leg_geometry(latitudes, longitudes):
+    """Great circle distance and initial true course of every leg along a path.
+
+    Args:
+        latitudes (numpy.ndarray): Degrees, one per point of the path.
+        longitudes (numpy.ndarray): Degrees, one per point of the path.
+
+    Returns:
+        List: [distances in nautical miles, courses in degrees 0 to 360], one per leg.
+    """
+    phi = numpy.radians(latitudes)
+    cos_phi = numpy.cos(phi)
+    sin_phi = numpy.sin(phi)
+    d_lambda = numpy.radians(numpy.diff(longitudes))
+    cos_phi1, cos_phi2 = cos_phi[:-1], cos_phi[1:]
+    sin_phi1, sin_phi2 = sin_phi[:-1], sin_phi[1:]
+
+    a = numpy.sin(numpy.diff(phi) / 2) ** 2 + cos_phi1 * cos_phi2 * numpy.sin(d_lambda / 2) ** 2
+    distances = 2 * EARTH_RADIUS_NM * numpy.arcsin(numpy.minimum(1.0, numpy.sqrt(a)))
+    courses = numpy.degrees(numpy.arctan2(
+        numpy.sin(d_lambda) * cos_phi2,
+        cos_phi1 * sin_phi2 - sin_phi1 * cos_phi2 * numpy.cos(d_lambda)
+    )) % 360
+    return [distances, courses]
+
@@ -1,5 +1,11 @@
+import json
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 def json_encoder(class_instance):
     if hasattr(class_instance, 'toJSON'):
@@ -8,3 +14,21 @@ def json_encoder(class_instance):
         return class_instance.isoformat()
     else:
         return class_instance.__dict__
+
+
+def dumps(value):
+    """Serialize to compact UTF-8 JSON bytes, objects through ``json_encoder``.
+
+    orjson is used when it is installed. Values it refuses, like integers above 64 bits,
+    fall back to the standard library, which writes the same bytes otherwise.
+
+    Returns:
+        bytes: JSON document.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=json_encoder, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+
+    return json.dumps(value, default=json_encoder, ensure_ascii=False, separators=(',', ':')).encode()
@@ -0,0 +1,181 @@
+import collections
+import sys
+import time
+from loguru import logger
+
+# Low cardinality text columns, one shared string object per distinct value.
+INTERNED_COLUMNS = {
+    'ident',
+    'type',
+    'continent',
+    'iso_country',
+    'iso_region',
+    'scheduled_service',
+    'source',
+    'start_ident'
+}
+
+# Rows fetched per round trip to the database thread while building.
+FETCH_SIZE = 2000
+
+
+def record_type(name, fields):
+    """Create a compact record class for a table.
+
+    Records are slotted tuples which still read like the ``aiosqlite.Row`` objects
+    they replace: ``record['ident']``, ``record[0]`` and ``dict(record)`` all work.
+    """
+    base = collections.namedtuple(name, fields)
+
+    class Record(base):
+        __slots__ = ()
+
+        def __getitem__(self, key):
+            if isinstance(key, str):
+                return getattr(self, key)
+            return tuple.__getitem__(self, key)
+
+        def keys(self):
+            return self._fields
+
+    Record.__name__ = name
+    Record.__qualname__ = name
+    return Record
+
+
+def intern_value(field, value):
+    if field in INTERNED_COLUMNS and isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+def deep_size(root):
+    """ Approximate resident size of a structure, counting every shared object once. """
+    seen = set()
+    size = 0
+    stack = [root]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+
+    return size
+
+
+class NavdataIndex:
+    """
+    Resident copy of the navdata, keyed by ident.
+
+    Initiates:
+        airports: ``dict`` ident: airport record.
+        airport_details: ``dict`` ident: {payload key: [detail records]}, runways and frequencies.
+        candidates: ``dict`` ident: {source: [candidate records]} in source precedence order.
+        build_seconds: time it took to build the index.
+        resident_bytes: approximate memory held by the index.
+    """
+    def __init__(self):
+        self.airports = {}
+        self.airport_details = {}
+        self.detail_keys = []
+        self.candidates = {}
+        self.build_seconds = None
+        self.resident_bytes = None
+
+    async def build(self, db, tables, ident_sources, candidate_columns, airport_details=None):
+        """Load airports and every ident table into memory.
+
+        Args:
+            db (aiosqlite.Connection): Open connection to the navdata database.
+            tables (Set): Tables present in the database.
+            ident_sources (Dict): source: table, in precedence order.
+            candidate_columns (Dict): source: column list used for candidate rows.
+            airport_details (Dict): payload key: (table, columns) of per airport rows to keep.
+        """
+        started = time.perf_counter()
+        airports = {}
+        details = {}
+        candidates = {}
+
+        if 'airports' in tables:
+            async with db.execute('SELECT * FROM airports') as cursor:
+                cursor.arraysize = FETCH_SIZE
+                airport_record = None
+                async for row in cursor:
+                    if airport_record is None:
+                        airport_record = record_type('Airport', row.keys())
+                    fields = airport_record._fields
+                    record = airport_record(*[intern_value(field, value) for field, value in zip(fields, row)])
+                    airports.setdefault(record.ident, record)
+
+        for key, (table, columns) in (airport_details or {}).items():
+            if table not in tables:
+                continue
+            detail_record = record_type(key.title().replace('_', ''), columns)
+            async with db.execute(f"SELECT airport_ident, {', '.join(columns)} FROM {table} ORDER BY rowid") as cursor:
+                cursor.arraysize = FETCH_SIZE
+                async for row in cursor:
+                    record = detail_record(*[intern_value(field, value) for field, value in zip(columns, row[1:])])
+                    details.setdefault(row[0], {}).setdefault(key, []).append(record)
+
+        candidate_record = None
+        for source, table in ident_sources.items():
+            if table not in tables:
+                continue
+            query = f"SELECT '{source}' AS source, {candidate_columns[source]} FROM {table} ORDER BY rowid"
+            async with db.execute(query) as cursor:
+                cursor.arraysize = FETCH_SIZE
+                async for row in cursor:
+                    if candidate_record is None:
+                        candidate_record = record_type('Candidate', row.keys())
+                    fields = candidate_record._fields
+                    record = candidate_record(*[intern_value(field, value) for field, value in zip(fields, row)])
+                    candidates.setdefault(record.ident, {}).setdefault(source, []).append(record)
+
+        self.airports = airports
+        self.airport_details = details
+        self.detail_keys = list(airport_details or {})
+        self.candidates = candidates
+        self.build_seconds = time.perf_counter() - started
+        self.resident_bytes = deep_size([airports, details, candidates])
+        logger.info(self.report())
+
+    def report(self):
+        return (
+            f'Resident navdata index: {len(self.airports)} airports, {len(self.candidates)} idents, '
+            f'{self.resident_bytes / 1048576:.1f} MiB, built in {self.build_seconds:.2f} s'
+        )
+
+    def airport_from_ident(self, ident):
+        airport = self.airports.get(ident)
+        if airport:
+            return dict(airport)
+
+    def airports_from_idents(self, idents):
+        airports = {}
+        for ident in set(idents):
+            airport = self.airports.get(ident)
+            if not airport:
+                continue
+            airport = dict(airport)
+            details = self.airport_details.get(ident, {})
+            for key in self.detail_keys:
+                airport[key] = [dict(record) for record in details.get(key, [])]
+            airports[ident] = airport
+
+        return airports
+
+    def resolve_idents(self, idents):
+        resolved = {}
+        for ident in set(idents):
+            found = self.candidates.get(ident)
+            if found:
+                resolved[ident] = found
+
+        return resolved
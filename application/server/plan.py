@@ -1,19 +1,28 @@
-import json
-import re
+import array
+import asyncio
 import builtins
+import collections.abc
+import difflib
 import math
+import re
+import sys
+import numpy
 from datetime import datetime
 from loguru import logger
 import server.exceptions
-import server.utility
-from server.json_encoder import json_encoder
+import server.coordinates
+import server.geo
+import server.disambiguation
+import server.route_syntax
+from server.json_encoder import dumps
+from server.route_syntax import tokenize, TOKEN_KIND_CODES
 
-TIME_FORMAT_REG = r"^(\d*):(\d*)$"
-DATE_FORMAT_REG = r"^(\d{4})-(\d{2})-(\d{2})$"
+TIME_FORMAT_REG = re.compile(r"^(\d*):(\d*)$")
+DATE_FORMAT_REG = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
 
 
 def time_format(time_str, **kwargs):
-    matches = re.search(TIME_FORMAT_REG, time_str)
+    matches = TIME_FORMAT_REG.search(time_str)
     if not matches:
         raise ValueError
 
@@ -25,7 +34,7 @@ def time_format(time_str, **kwargs):
 
 
 def date_format(date_str, **kwargs):
-    matches = re.search(DATE_FORMAT_REG, date_str)
+    matches = DATE_FORMAT_REG.search(date_str)
     if not matches:
         raise ValueError
 
@@ -134,6 +143,14 @@ MODEL = {
     'cargo': 'int'
 }
 
+# Where a route ident is looked up, in order of precedence.
+WAYPOINT_SOURCES = ['waypoint', 'navaid', 'track', 'route', 'high_route']
+
+DB_NO_COORD_TYPES = ['route', 'high_route']
+DB_ENTRY_WP_TYPES = ['route', 'high_route']
+# Route tokens which are syntax rather than a place, they keep their token kind as ``wp_type``.
+SYNTAX_TYPES = [server.route_syntax.SPEED_LEVEL, server.route_syntax.PROCEDURE, server.route_syntax.MARKER]
+
 WAYPOINT_MODEL = {
     'name': 'str',
     'latitude': 'float',
@@ -142,134 +159,224 @@ WAYPOINT_MODEL = {
     'speed': 'int'
 }
 
+# Route column layout, see ``Route``.
+WAYPOINT_TYPES = [
+    None, 'waypoint', 'navaid', 'track', 'route', 'high_route', 'other', 'dct', 'speed_level', 'procedure', 'marker'
+]
+WAYPOINT_TYPE_CODES = {wp_type: code for code, wp_type in enumerate(WAYPOINT_TYPES) if wp_type}
+FLAG_ALTITUDE = 1
+FLAG_SPEED = 2
+FLAG_NOT_IN_DATABASE = 4
+# Picked by ``Route.enrich`` among several candidates, its fix depends on the waypoints around it.
+FLAG_AMBIGUOUS = 8
+# Flags written by enrichment rather than parsed from the waypoint.
+ENRICHMENT_FLAGS = FLAG_NOT_IN_DATABASE | FLAG_AMBIGUOUS
+FIELD_FLAGS = {'altitude': FLAG_ALTITUDE, 'speed': FLAG_SPEED, 'not_in_database': FLAG_NOT_IN_DATABASE}
+WAYPOINT_FIELDS = ['name', 'latitude', 'longitude', 'altitude', 'speed', 'wp_type', 'not_in_database']
+# Extra fields written by enrichment, kept in enrichment results.
+ENRICHED_EXTRA_FIELDS = ['latitude', 'longitude', 'wp_type', 'fixes']
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+MISSING = object()
+
+
+class FieldSkipped(Exception):
+    """ Raised by a compiled field parser when the value is left out, with the parse error message. """
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def compile_field(key, spec):
+    """Turn one model field spec into a parser for that field.
+
+    Values are converted by the spec's builtin type or ``format`` function and checked against
+    its ``max``/``min`` length, with every spec lookup done here once instead of for each value.
 
-def model_parser(data, model, **kwargs):
-    """Parse input data according to a model.
+    Returns:
+        Callable: parser(value, kwargs) returning the formatted value, raising ``FieldSkipped``.
+    """
+    if isinstance(spec, str):
+        convert = getattr(builtins, spec)
 
-    Args:
-        data (Dict): Input data
-        model (Dict): Input model
+        def parse_type(value, kwargs):
+            try:
+                return convert(value)
+            except ValueError:
+                raise FieldSkipped(f'Input {value} in wrong format or value for {key}. Passing.')
 
-    Raises:
-        server.exceptions.MissingField: Raises when required field is missing or badly formatted.
+        return parse_type
 
-    Returns:
-        List: [parsed_data, parse_errors]
-    """
-    formatted = {}
-    errors = []
+    if 'format' in spec:
+        formatter = spec['format']
 
-    # FORMAT DATA PER MODEL
-    for key, value in data.items():
-        # CHECK IF SPEC EXISTS
-        try:
-            spec = model[key]
-        except KeyError:
-            errors.append({
-                'key': key,
-                'message': f'Spec not found {key}. Passing.'
-            })
-            continue
-
-        # Only type.
-        if isinstance(spec, str):
+        def parse_format(value, kwargs):
             try:
-                formatted_value = getattr(builtins, spec)(value)
+                return formatter(value, **kwargs)
             except ValueError:
-                errors.append({
-                    'key': key,
-                    'message': f'Input {value} in wrong format or value for {key}. Passing.'
-                })
-                continue
-        else:
-            # Has an external formatter
-            if 'format' in spec:
+                raise FieldSkipped(f'Input {value} in wrong format or value for {key}. Passing.')
+
+        return parse_format
+
+    if 'type' not in spec:
+        def parse_untyped(value, kwargs):
+            raise FieldSkipped(f'Spec does have type for {key}. Passing.')
+
+        return parse_untyped
+
+    convert = getattr(builtins, spec['type'])
+    has_max = 'max' in spec
+    has_min = 'min' in spec
+    maximum = spec.get('max')
+    minimum = spec.get('min')
+
+    def parse_limited(value, kwargs):
+        formatted_value = convert(value)
+        if has_max and maximum < len(value):
+            raise FieldSkipped(f'Out of max value {key}. Passing.')
+        if has_min and minimum > len(value):
+            raise FieldSkipped(f'Out of min value {key}. Passing.')
+        return formatted_value
+
+    return parse_limited
+
+
+class ModelParser:
+    """
+    A model compiled once into one parser per field.
+
+    Initiates:
+        model: model the parser was compiled from.
+        types: key: builtin type of the fields which are only a type.
+        fields: key: field parser, see ``compile_field``.
+        required: keys which must be in the parsed data, in model order.
+    """
+    def __init__(self, model):
+        self.model = model
+        # Plain type fields are converted inline, saving a call per value.
+        self.types = {key: getattr(builtins, spec) for key, spec in model.items() if isinstance(spec, str)}
+        self.fields = {key: compile_field(key, spec) for key, spec in model.items()}
+        self.required = [key for key, spec in model.items() if isinstance(spec, dict) and spec.get('required')]
+
+    def parse(self, data, **kwargs):
+        """Parse input data according to the model.
+
+        Fields without a spec or in a wrong format are left out and reported as parse errors.
+
+        Raises:
+            server.exceptions.MissingField: Raises when required field is missing or badly formatted.
+
+        Returns:
+            List: [parsed_data, parse_errors]
+        """
+        types = self.types
+        fields = self.fields
+        formatted = {}
+        errors = []
+        for key, value in data.items():
+            convert = types.get(key)
+            if convert is not None:
                 try:
-                    formatted_value = spec['format'](value, **kwargs)
+                    formatted[key] = convert(value)
                 except ValueError:
                     errors.append({
                         'key': key,
                         'message': f'Input {value} in wrong format or value for {key}. Passing.'
                     })
-                    continue
-            # Internal type and other attributes.
-            else:
-                try:
-                    # type
-                    formatted_value = getattr(builtins, spec['type'])(value)
-                    if 'max' in spec and spec['max'] < len(value):
-                        errors.append({
-                            'key': key,
-                            'message': f'Out of max value {key}. Passing.'
-                        })
-                        continue
-                    if 'min' in spec and spec['min'] > len(value):
-                        errors.append({
-                            'key': key,
-                            'message': f'Out of min value {key}. Passing.'
-                        })
-                        continue
-                except KeyError:
-                    errors.append({
-                        'key': key,
-                        'message': f'Spec does have type for {key}. Passing.'
-                    })
-                    continue
-        formatted[key] = formatted_value
+                continue
+
+            parser = fields.get(key)
+            if parser is None:
+                errors.append({
+                    'key': key,
+                    'message': f'Spec not found {key}. Passing.'
+                })
+                continue
+
+            try:
+                formatted[key] = parser(value, kwargs)
+            except FieldSkipped as exc:
+                errors.append({
+                    'key': key,
+                    'message': exc.message
+                })
 
-    # CHECK FOR REQUIRED FIELDS
-    for key, value in model.items():
-        if isinstance(value, dict) and 'required' in value and value['required']:
+        for key in self.required:
             if key not in formatted:
                 error_msg = f'Missing required field {key}'
                 logger.error(error_msg)
                 raise server.exceptions.MissingField(key, None, error_msg)
 
-    if errors:
-        logger.warning(errors)
+        if errors:
+            logger.warning(errors)
+
+        return [formatted, errors]
 
-    return [formatted, errors]
+
+PLAN_PARSER = ModelParser(MODEL)
+WAYPOINT_PARSER = ModelParser(WAYPOINT_MODEL)
 
 
 class Waypoint:
+    """
+    View of one waypoint of a ``Route``, reading and writing the route's columns.
+
+    Initiates:
+        route: route holding the waypoint.
+        index: position of the waypoint in the route.
+    """
+    __slots__ = ('route', 'index')
+
     def __init__(self, waypoint, server):
-        parsed = model_parser(waypoint, WAYPOINT_MODEL, server=server)
-        self.server = server
-        self.waypoint = parsed[0]
-        self.errors = parsed[1]
+        self.route = Route([waypoint], server)
+        self.index = 0
+
+    @classmethod
+    def view(cls, route, index):
+        waypoint = cls.__new__(cls)
+        waypoint.route = route
+        waypoint.index = index
+        return waypoint
+
+    @property
+    def server(self):
+        return self.route.server
+
+    @property
+    def errors(self):
+        return self.route.errors.get(self.index, [])
+
+    @property
+    def waypoint(self):
+        """ Copy of the waypoint's fields, write through ``waypoint[key] = value`` instead. """
+        return self.route.fields(self.index)
+
+    @property
+    def kind(self):
+        """ Token kind of the name, see ``server.route_syntax``. """
+        return server.route_syntax.TOKEN_KINDS[self.route.kinds[self.index]]
+
+    @property
+    def ident(self):
+        return self.route.ident(self.index)
 
     async def detect_track(self, ident):
-        track_re = r"^(\d*)(N|S)(\d*)(W|E)$"
-        matches = re.search(track_re, ident)
-        if matches:
-            coord = matches.groups()
-            lat = server.utility.convert_lat(f'{coord[0]}0000{coord[1]}')
-            lon = server.utility.convert_lon(f'{coord[2].zfill(3)}0000{coord[3]}')
-            return [{
-                'latitude_deg': lat,
-                'longitude_deg': lon
-            }]
-
-    async def find_closest(self, points, last_found):
-        logger.debug(f"Found multiple points: {points} Searching closest to {last_found}")
-        last_delta = None
-        closest = None
-        for point in points:
-            lat_delta = float(point['latitude_deg']) - last_found['latitude']
-            lon_delta = float(point['longitude_deg']) - last_found['longitude']
-            this_delta = math.sqrt(math.pow(lat_delta, 2) + math.pow(lon_delta, 2))
-            if not last_delta or this_delta < last_delta:
-                closest = point
-                last_delta = this_delta
+        try:
+            latitude, longitude = server.coordinates.decode_position(ident)
+        except server.coordinates.CoordinateError:
+            return None
 
-        return dict(closest)
+        return [{
+            'latitude_deg': latitude,
+            'longitude_deg': longitude
+        }]
 
     async def find_entry(self, points, last_found):
         if not points:
             return None
 
         for point in points:
-            if point['start_ident'] == last_found['name']:
+            if point['start_ident'] == last_found.ident:
                 return point
         else:
             try:
@@ -277,107 +384,720 @@ class Waypoint:
             except IndexError:  # !! Make sure of this exception later on
                 return None
 
-    async def enrich(self, last_found=None):
-        db_callable_coords = {
-            'waypoint': self.server.database.waypoint_from_ident,
-            'navaid': self.server.database.navaid_from_ident,
-            'track': self.detect_track,
-            'route': self.server.database.route_from_ident,
-            'high_route': self.server.database.high_route_from_ident,
-        }
+    async def select_candidates(self, candidates):
+        """Pick the source this ident resolves to, by precedence.
 
-        db_no_coord_types = ['route', 'high_route']
-        db_entry_wp_types = ['route', 'high_route']
+        Route syntax and positions are read from the token, only fix and airway idents
+        are picked from the navdata candidates.
 
-        if self.waypoint['name'].upper() == 'DCT':
-            self.waypoint['wp_type'] = 'dct'
-            return
+        Args:
+            candidates (Dict): {source: [rows]} for this ident.
 
-        for key, call in db_callable_coords.items():
-            called = await call(self.waypoint['name'])
+        Returns:
+            List: [source, points], [None, None] when nothing matched.
+        """
+        kind = self.kind
+        if kind in SYNTAX_TYPES:
+            return [kind, None]
+        if kind == server.route_syntax.POSITION:
+            return ['track', await self.detect_track(self.ident)]
+        if kind not in server.route_syntax.LOOKUP_KINDS:
+            return [None, None]
+
+        for key in WAYPOINT_SOURCES:
+            called = candidates.get(key)
             if called:
-                if len(called) == 1 or not last_found:
-                    wp = list(called)[0]
-                else:
-                    if key in db_entry_wp_types:
-                        wp = await self.find_entry(called, last_found)
-                    else:
-                        wp = await self.find_closest(called, last_found)
+                return [key, list(called)]
 
-                self.waypoint['wp_type'] = key
-                break
-        else:
-            self.waypoint['wp_type'] = 'other'
-            self.waypoint['not_in_database'] = True
+        return [None, None]
+
+    def is_dct(self):
+        return self.kind == server.route_syntax.DCT
+
+    def has_coordinates(self):
+        return 'latitude' in self and 'longitude' in self
+
+    def apply(self, key, wp):
+        """ Store the chosen point. Returns the waypoint, None if it did not resolve to a fix. """
+        if key is None:
+            self['wp_type'] = 'other'
+            self['not_in_database'] = True
             return
 
-        if self.waypoint['wp_type'] in db_no_coord_types:
+        self['wp_type'] = key
+        if key in DB_NO_COORD_TYPES or key in SYNTAX_TYPES:
             return
 
-        if 'latitude' not in self.waypoint and wp['latitude_deg'] != '':
-            self.waypoint['latitude'] = float(wp['latitude_deg'])
+        if 'latitude' not in self and wp['latitude_deg'] not in ('', None):
+            self['latitude'] = float(wp['latitude_deg'])
 
-        if 'longitude' not in self.waypoint and wp['longitude_deg'] != '':
-            self.waypoint['longitude'] = float(wp['longitude_deg'])
+        if 'longitude' not in self and wp['longitude_deg'] not in ('', None):
+            self['longitude'] = float(wp['longitude_deg'])
 
-        return self.waypoint
+        return self
 
     def __str__(self):
-        return self.waypoint['name']
+        return self['name']
 
     def __getitem__(self, key):
-        return self.waypoint[key]
+        value = self.route.field(self.index, key)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.route.set_field(self.index, key, value)
 
     def __contains__(self, key):
-        return key in self.waypoint
+        return self.route.field(self.index, key) is not MISSING
+
+    def get(self, key, default=None):
+        value = self.route.field(self.index, key)
+        return default if value is MISSING else value
 
     def toJSON(self):
-        return self.waypoint
+        return self.route.fields(self.index)
+
+
+class WaypointList(collections.abc.Sequence):
+    """ ``Route.waypoints``, creating a ``Waypoint`` view for each item on access. """
+    __slots__ = ('route', )
+
+    def __init__(self, route):
+        self.route = route
+
+    def __len__(self):
+        return len(self.route.names)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [Waypoint.view(self.route, position) for position in range(len(self))[index]]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return Waypoint.view(self.route, index)
+
+
+def matching_blocks(previous, names):
+    """Runs of idents two versions of a route have in common.
+
+    The common head and tail are matched directly and only what lies between them is
+    diffed, so an edit costs about as much as its own size.
+
+    Args:
+        previous (List): Idents of the earlier version.
+        names (List): Idents of the new version.
+
+    Returns:
+        List: (previous start, start, size) of every run, in order.
+    """
+    limit = min(len(previous), len(names))
+    head = 0
+    while head < limit and previous[head] == names[head]:
+        head += 1
+    tail = 0
+    while tail < limit - head and previous[-1 - tail] == names[-1 - tail]:
+        tail += 1
+
+    blocks = [(0, 0, head)] if head else []
+    matcher = difflib.SequenceMatcher(None, previous[head:len(previous) - tail], names[head:len(names) - tail], autojunk=False)
+    for start, new_start, size in matcher.get_matching_blocks():
+        if size:
+            blocks.append((head + start, head + new_start, size))
+    if tail:
+        blocks.append((len(previous) - tail, len(names) - tail, tail))
+
+    return blocks
+
+
+def name_kind(name):
+    """ TOKEN_KIND_CODES code of a waypoint name read on its own, names which are not strings are OTHER. """
+    kind = server.route_syntax.read(name)[0] if isinstance(name, str) else server.route_syntax.OTHER
+    return server.route_syntax.TOKEN_KIND_CODES[kind]
 
 
 class Route:
+    """
+    Waypoints of a route stored as columns, one entry per waypoint.
+
+    ``route.waypoints`` gives ``Waypoint`` views over the columns, which read like the
+    waypoint dicts they replace.
+
+    Initiates:
+        names: waypoint idents.
+        latitudes, longitudes: degrees, NaN when unknown.
+        altitudes, speeds: WAYPOINT_MODEL values, present when their flag is set.
+        types: index into WAYPOINT_TYPES of the resolved ``wp_type``, 0 when not resolved.
+        flags: FLAG_* bits.
+        kinds: index into ``server.route_syntax.TOKEN_KINDS`` of each name, read when it is set.
+        extra: index: {key: value} of fields with no column, like airway ``fixes``.
+        errors: index: parse errors of waypoints which had any.
+        stale: indices ``enrich`` still has to resolve, ``None`` until the route is first enriched.
+    """
+    __slots__ = (
+        'server', 'names', 'latitudes', 'longitudes', 'altitudes', 'speeds', 'types', 'flags', 'kinds', 'extra', 'errors',
+        'stale'
+    )
+
     def __init__(self, route, server):
         self.server = server
-        self.waypoints = []
+        self.names = []
+        self.latitudes = array.array('d')
+        self.longitudes = array.array('d')
+        self.altitudes = array.array('q')
+        self.speeds = array.array('q')
+        self.types = bytearray()
+        self.flags = bytearray()
+        self.kinds = bytearray()
+        self.extra = {}
+        self.errors = {}
+        self.stale = None
         if isinstance(route, list):
-            for item in route:
-                self.waypoints.append(Waypoint(item, server))
+            waypoints = []
+            for index, item in enumerate(route):
+                parsed, errors = WAYPOINT_PARSER.parse(item, server=server)
+                if errors:
+                    self.errors[index] = errors
+                waypoints.append(parsed)
+            self.extend(waypoints)
         else:
-            splitted_route = route.split(' ')
-            for wp_name in splitted_route:
-                self.waypoints.append(Waypoint({
-                    'name': wp_name
-                }, server))
+            # A plain route string has no fields to parse, speed and level changes come from its syntax.
+            tokens = tokenize(route)
+            count = len(tokens)
+            self.names = [sys.intern(token.text) for token in tokens]
+            self.latitudes = array.array('d', [math.nan]) * count
+            self.longitudes = array.array('d', [math.nan]) * count
+            self.altitudes = array.array('q', [0 if token.altitude is None else token.altitude for token in tokens])
+            self.speeds = array.array('q', [0 if token.speed is None else token.speed for token in tokens])
+            self.types = bytearray(count)
+            self.flags = bytearray(
+                (FLAG_ALTITUDE if token.altitude is not None else 0) | (FLAG_SPEED if token.speed is not None else 0)
+                for token in tokens
+            )
+            self.kinds = bytearray(TOKEN_KIND_CODES[token.kind] for token in tokens)
+
+    def extend(self, waypoints):
+        """ Add waypoints from their parsed WAYPOINT_MODEL fields, a column at a time. """
+        nan = math.nan
+        latitudes = [fields.get('latitude', nan) for fields in waypoints]
+        longitudes = [fields.get('longitude', nan) for fields in waypoints]
+        altitudes = [fields.get('altitude') for fields in waypoints]
+        speeds = [fields.get('speed') for fields in waypoints]
+        try:
+            columns = [
+                array.array('d', latitudes),
+                array.array('d', longitudes),
+                array.array('q', [0 if altitude is None else altitude for altitude in altitudes]),
+                array.array('q', [0 if speed is None else speed for speed in speeds])
+            ]
+        except (TypeError, OverflowError):
+            # Values the columns cannot hold go to extra, one field at a time.
+            for fields in waypoints:
+                self.append(fields)
+            return
+
+        names = [fields.get('name', MISSING) for fields in waypoints]
+        self.names.extend(sys.intern(name) if isinstance(name, str) else name for name in names)
+        self.kinds.extend(name_kind(name) for name in names)
+        self.latitudes.extend(columns[0])
+        self.longitudes.extend(columns[1])
+        self.altitudes.extend(columns[2])
+        self.speeds.extend(columns[3])
+        self.types.extend(bytes(len(waypoints)))
+        self.flags.extend(
+            (FLAG_ALTITUDE if altitude is not None else 0) | (FLAG_SPEED if speed is not None else 0)
+            for altitude, speed in zip(altitudes, speeds)
+        )
+
+    def append(self, fields):
+        """ Add a waypoint from its parsed WAYPOINT_MODEL fields. """
+        index = len(self.names)
+        name = fields.get('name', MISSING)
+        self.names.append(sys.intern(name) if isinstance(name, str) else name)
+        self.kinds.append(name_kind(name))
+        self.latitudes.append(math.nan)
+        self.longitudes.append(math.nan)
+        self.altitudes.append(0)
+        self.speeds.append(0)
+        self.types.append(0)
+        self.flags.append(0)
+        for key, value in fields.items():
+            if key != 'name':
+                self.set_field(index, key, value)
+
+    def field(self, index, key):
+        """ Value of one waypoint field, MISSING when the waypoint does not have it. """
+        if key == 'name':
+            return self.names[index]
+        if key == 'latitude' or key == 'longitude':
+            value = (self.latitudes if key == 'latitude' else self.longitudes)[index]
+            if value == value:
+                return value
+            return self.extra.get(index, {}).get(key, MISSING)
+        if key == 'wp_type':
+            code = self.types[index]
+            return WAYPOINT_TYPES[code] if code else self.extra.get(index, {}).get(key, MISSING)
+        flag = FIELD_FLAGS.get(key)
+        if flag and self.flags[index] & flag:
+            if key == 'not_in_database':
+                return True
+            return (self.altitudes if key == 'altitude' else self.speeds)[index]
+        return self.extra.get(index, {}).get(key, MISSING)
+
+    def set_field(self, index, key, value):
+        if key == 'name':
+            self.names[index] = value
+            self.kinds[index] = name_kind(value)
+            return
+        if (key == 'latitude' or key == 'longitude') and isinstance(value, float) and value == value:
+            (self.latitudes if key == 'latitude' else self.longitudes)[index] = value
+            return
+        if key == 'wp_type' and value in WAYPOINT_TYPE_CODES:
+            self.types[index] = WAYPOINT_TYPE_CODES[value]
+            return
+        if key == 'not_in_database' and value is True:
+            self.flags[index] |= FLAG_NOT_IN_DATABASE
+            return
+        if (key == 'altitude' or key == 'speed') and type(value) is int and INT64_MIN <= value <= INT64_MAX:
+            (self.altitudes if key == 'altitude' else self.speeds)[index] = value
+            self.flags[index] |= FIELD_FLAGS[key]
+            return
+        self.extra.setdefault(index, {})[key] = value
+
+    def fields(self, index):
+        """ The waypoint as a dict, like the WAYPOINT_MODEL dict it is parsed from. """
+        waypoint = {}
+        for key in WAYPOINT_FIELDS:
+            value = self.field(index, key)
+            if value is not MISSING:
+                waypoint[key] = value
+        waypoint.update(self.extra.get(index, {}))
+        return waypoint
+
+    def ident(self, index):
+        """ What the waypoint is looked up by, its name without a ``/N0450F350`` speed and level change. """
+        name = self.names[index]
+        if isinstance(name, str) and '/' in name:
+            return name.split('/', 1)[0]
+        return name
+
+    @property
+    def waypoints(self):
+        return WaypointList(self)
+
+    def __len__(self):
+        return len(self.names)
 
     def __str__(self):
-        if self.waypoints:
-            return ' '.join(str(x) for x in self.waypoints)
-        # No waypoints
-        return self.route
-
-    async def enrich(self):
-        last_found = None
-        for waypoint in self.waypoints:
-            await waypoint.enrich(last_found=last_found)
-            if 'latitude' in waypoint or 'longitude' in waypoint:
-                last_found = waypoint
+        return ' '.join(str(name) for name in self.names if name is not MISSING)
+
+    def same_as(self, other):
+        """ Whether ``other`` holds the same waypoints with the same fields, NaN coordinates included. """
+        return (
+            self.names == other.names
+            and self.latitudes.tobytes() == other.latitudes.tobytes()
+            and self.longitudes.tobytes() == other.longitudes.tobytes()
+            and self.altitudes == other.altitudes
+            and self.speeds == other.speeds
+            and self.types == other.types
+            and self.flags == other.flags
+            and self.extra == other.extra
+        )
+
+    def enrichment_key(self):
+        """ Everything enrichment reads from the route: the idents and the coordinates they came with. """
+        return (tuple(self.names), self.latitudes.tobytes(), self.longitudes.tobytes())
+
+    def enrichment(self):
+        """Copy of what ``enrich`` wrote, for ``restore_enrichment`` on a route with the same ``enrichment_key``.
+
+        Returns:
+            List: [latitudes, longitudes, types, ENRICHMENT_FLAGS, {index: {extra fields}}]
+        """
+        extra = {}
+        for index, fields in self.extra.items():
+            enriched = {key: fields[key] for key in ENRICHED_EXTRA_FIELDS if key in fields}
+            if enriched:
+                extra[index] = enriched
+
+        return [
+            self.latitudes.tobytes(),
+            self.longitudes.tobytes(),
+            bytes(self.types),
+            bytes(flag & ENRICHMENT_FLAGS for flag in self.flags),
+            extra
+        ]
+
+    def restore_enrichment(self, enrichment):
+        """ Apply an ``enrichment`` result instead of running ``enrich``. """
+        latitudes, longitudes, types, flags, extra = enrichment
+        self.latitudes = array.array('d', latitudes)
+        self.longitudes = array.array('d', longitudes)
+        self.types = bytearray(types)
+        self.flags = bytearray(own | flag for own, flag in zip(self.flags, flags))
+        for index, fields in extra.items():
+            self.extra.setdefault(index, {}).update(fields)
+        self.stale = set()
+
+    def carry_enrichment(self, previous):
+        """Keep the enrichment of waypoints unchanged since ``previous``, an earlier version of this route.
+
+        Tokens are matched with a diff of both ident sequences. Inserted and replaced tokens and
+        the tokens right next to an edit are left ``stale``, along with every waypoint whose fix
+        depends on them, see ``mark_stale``.
+
+        Args:
+            previous (Route): Route this one replaces.
+        """
+        if previous.stale is None:
+            return
+
+        count = len(self.names)
+        blocks = matching_blocks(previous.names, self.names)
+        stale = set()
+        previous_end = end = 0
+        for start, new_start, size in blocks + [(len(previous.names), count, 0)]:
+            if start != previous_end or new_start != end:
+                stale.update(range(max(end - 1, 0), min(new_start + 1, count)))
+            previous_end, end = start + size, new_start + size
+
+        # Previous index each waypoint takes its enrichment from, -1 where there is none.
+        sources = numpy.full(count, -1)
+        for start, new_start, size in blocks:
+            sources[new_start:new_start + size] = numpy.arange(start, start + size)
+            stale.update(new_start + index - start for index in previous.stale if start <= index < start + size)
+
+        latitudes = numpy.frombuffer(self.latitudes, dtype=numpy.float64)
+        longitudes = numpy.frombuffer(self.longitudes, dtype=numpy.float64)
+        # Coordinates given with the new waypoint win, resolve it again.
+        own = ~(numpy.isnan(latitudes) & numpy.isnan(longitudes)) & (sources >= 0)
+        stale.update(numpy.flatnonzero(own).tolist())
+        sources[own] = -1
+        if stale:
+            sources[list(stale)] = -1
+
+        carried = numpy.flatnonzero(sources >= 0)
+        origins = sources[carried]
+        latitudes[carried] = numpy.frombuffer(previous.latitudes, dtype=numpy.float64)[origins]
+        longitudes[carried] = numpy.frombuffer(previous.longitudes, dtype=numpy.float64)[origins]
+        numpy.frombuffer(self.types, dtype=numpy.uint8)[carried] = numpy.frombuffer(bytes(previous.types), dtype=numpy.uint8)[origins]
+        numpy.frombuffer(self.flags, dtype=numpy.uint8)[carried] |= \
+            numpy.frombuffer(bytes(previous.flags), dtype=numpy.uint8)[origins] & ENRICHMENT_FLAGS
+
+        targets = dict(zip(origins.tolist(), carried.tolist()))
+        for index, fields in previous.extra.items():
+            enriched = {key: value for key, value in fields.items() if key in ENRICHED_EXTRA_FIELDS}
+            if enriched and index in targets:
+                self.extra.setdefault(targets[index], {}).update(enriched)
+
+        self.stale = set()
+        self.mark_stale(stale)
+
+    def is_fixed(self, index):
+        """ Whether the waypoint's position holds whatever is picked around it: it has coordinates not chosen among others. """
+        return (
+            not self.flags[index] & FLAG_AMBIGUOUS
+            and self.field(index, 'latitude') is not MISSING
+            and self.field(index, 'longitude') is not MISSING
+        )
+
+    def mark_stale(self, indices):
+        """Leave ``indices`` for ``enrich`` to resolve again, with every waypoint whose pick can depend on them.
+
+        Fixes are picked together between fixed positions, see ``is_fixed``, so the waypoints
+        around each index are marked up to the nearest one on both sides, or the end of the
+        route where the airport anchors it. Resolving them gives what a full enrichment would.
+
+        Args:
+            indices (Iterable): Waypoints which changed.
+        """
+        if self.stale is None:
+            return
+
+        count = len(self.names)
+        marked = set(indices)
+        for index in sorted(marked):
+            for step in (-1, 1):
+                neighbour = index + step
+                while 0 <= neighbour < count and neighbour not in marked and not self.is_fixed(neighbour):
+                    marked.add(neighbour)
+                    neighbour += step
+
+        for index in marked - self.stale:
+            self.clear_enrichment(index)
+        self.stale |= marked
+
+    def clear_enrichment(self, index):
+        """ Drop what ``enrich`` wrote for one waypoint, coordinates only when they were picked rather than given. """
+        flags = self.flags[index]
+        if flags & FLAG_AMBIGUOUS:
+            self.latitudes[index] = math.nan
+            self.longitudes[index] = math.nan
+        self.types[index] = 0
+        self.flags[index] = flags & ~ENRICHMENT_FLAGS
+        fields = self.extra.get(index)
+        if fields:
+            for key in ['wp_type', 'fixes'] + (['latitude', 'longitude'] if flags & FLAG_AMBIGUOUS else []):
+                fields.pop(key, None)
+            if not fields:
+                del self.extra[index]
+
+    def anchor(self, index, step, stop=None):
+        """Position of the first waypoint with coordinates from ``index`` on, walking by ``step``.
+
+        Args:
+            index (int): Waypoint to start from.
+            step (int): 1 to walk forward, -1 to walk back.
+            stop (int): Waypoint to stop before, the end of the route by default.
+
+        Returns:
+            Tuple: (latitude, longitude), None when no waypoint on the way has both.
+        """
+        if stop is None:
+            stop = len(self.names) if step > 0 else -1
+        while index != stop:
+            latitude = self.field(index, 'latitude')
+            longitude = self.field(index, 'longitude')
+            if latitude is not MISSING and longitude is not MISSING:
+                return (latitude, longitude)
+            index += step
+
+        return None
+
+    def last_found(self, index):
+        """ Closest waypoint before ``index`` with a latitude or longitude, airway entries are found from it. """
+        for previous in range(index - 1, -1, -1):
+            if self.field(previous, 'latitude') is not MISSING or self.field(previous, 'longitude') is not MISSING:
+                return Waypoint.view(self, previous)
+
+        return None
+
+    def flown_path(self):
+        """Points the route flies over in order: waypoints with coordinates and the fixes of expanded airways.
+
+        Returns:
+            List: [names, latitudes, longitudes], coordinates as NumPy arrays of degrees.
+        """
+        latitudes = numpy.frombuffer(self.latitudes, dtype=numpy.float64)
+        longitudes = numpy.frombuffer(self.longitudes, dtype=numpy.float64)
+        positioned = numpy.flatnonzero(~(numpy.isnan(latitudes) | numpy.isnan(longitudes)))
+        airways = sorted(index for index, fields in self.extra.items() if fields.get('fixes'))
+        if not airways:
+            names = [self.names[index] for index in positioned.tolist()]
+            return [names, latitudes[positioned], longitudes[positioned]]
+
+        names = []
+        latitude_parts = []
+        longitude_parts = []
+        begin = 0
+        for airway in airways + [None]:
+            end = len(positioned) if airway is None else int(numpy.searchsorted(positioned, airway))
+            part = positioned[begin:end]
+            names.extend(self.names[index] for index in part.tolist())
+            latitude_parts.append(latitudes[part])
+            longitude_parts.append(longitudes[part])
+            begin = end
+            if airway is not None:
+                fixes = [fix for fix in self.extra[airway]['fixes'] if 'latitude' in fix]
+                names.extend(fix['name'] for fix in fixes)
+                latitude_parts.append(numpy.array([fix['latitude'] for fix in fixes], dtype=numpy.float64))
+                longitude_parts.append(numpy.array([fix['longitude'] for fix in fixes], dtype=numpy.float64))
+
+        return [names, numpy.concatenate(latitude_parts), numpy.concatenate(longitude_parts)]
+
+    def pending(self):
+        """ Indices ``enrich`` resolves by default, all of them until the route is first enriched. """
+        if self.stale is None:
+            return range(len(self.names))
+        return sorted(self.stale)
+
+    async def fetch_candidates(self, indices=None):
+        """Fetch the navdata candidates of the route's fix and airway idents.
+
+        Args:
+            indices (Iterable): Waypoints to fetch for, ``pending()`` by default.
+
+        Returns:
+            Dict: {ident: {source: [rows]}} as returned by ``Database.resolve_idents``.
+        """
+        if indices is None:
+            indices = self.pending()
+        kinds = self.kinds
+        lookup = {server.route_syntax.TOKEN_KIND_CODES[kind] for kind in server.route_syntax.LOOKUP_KINDS}
+        idents = [self.ident(index) for index in indices if kinds[index] in lookup]
+        return await self.server.database.resolve_idents(idents)
+
+    async def enrich(self, departure=None, destination=None, candidates=None, indices=None):
+        """Resolve the waypoints of the route.
+
+        Candidates for all idents are fetched up front in one query. Fixes are then chosen
+        together in memory so the whole route is as short as possible, see ``server.disambiguation``.
+
+        Only the ``pending()`` waypoints are resolved by default, everything on first enrichment.
+        Waypoints left alone keep their fix and anchor the search for the ones around them.
+
+        Args:
+            departure (Dict): Departure airport row, anchors the start of the route.
+            destination (Dict): Destination airport row, anchors the end of the route.
+            candidates (Dict): Pre-fetched result of ``fetch_candidates``. Fetched when omitted.
+            indices (Iterable): Waypoints to resolve instead of ``pending()``.
+        """
+        pending = indices is None
+        resolving = set(self.pending() if pending else indices)
+        ordered = sorted(resolving)
+
+        # Fetch phase, the only one that waits on the database.
+        if candidates is None:
+            candidates = await self.fetch_candidates(ordered)
+
+        # Disambiguation phase, in memory from here on.
+        waypoints = self.waypoints
+        selected = {}
+        for index in ordered:
+            waypoint = waypoints[index]
+            if waypoint.is_dct():
+                selected[index] = [None, None]
+            else:
+                selected[index] = await waypoint.select_candidates(candidates.get(waypoint.ident, {}))
+
+        # Every waypoint which resolves to a fix takes part in the search, split into runs
+        # between the waypoints which keep their fix.
+        picks = {}
+        runs = []
+        steps = []
+        start = None
+        if ordered:
+            start = self.anchor(ordered[0] - 1, -1) or server.disambiguation.airport_position(departure)
+        for position, index in enumerate(ordered):
+            previous = ordered[position - 1] if position else index
+            if index - previous > 1:
+                end = self.anchor(previous + 1, 1, stop=index)
+                if end is not None:
+                    if steps:
+                        runs.append([steps, start, end])
+                        steps = []
+                    start = self.anchor(index - 1, -1, stop=previous)
+
+            key, points = selected[index]
+            if key is None or key in DB_NO_COORD_TYPES or key in SYNTAX_TYPES:
+                continue
+
+            waypoint = waypoints[index]
+            if waypoint.has_coordinates():
+                rows = [0]
+                coordinates = numpy.array([[waypoint['latitude'], waypoint['longitude']]])
+            else:
+                rows, coordinates = server.disambiguation.candidate_coordinates(points)
+                if not rows:
+                    picks[index] = points[0]
+                    continue
+
+            steps.append([index, points, rows, coordinates])
+
+        if steps:
+            end = self.anchor(ordered[-1] + 1, 1) or server.disambiguation.airport_position(destination)
+            runs.append([steps, start, end])
+
+        ambiguous = set()
+        for steps, start, end in runs:
+            path = server.disambiguation.shortest_path([step[3] for step in steps], start=start, end=end)
+            for (index, points, rows, coordinates), pick in zip(steps, path):
+                picks[index] = points[rows[pick]]
+                if len(rows) > 1:
+                    ambiguous.add(index)
+
+        flags = self.flags
+        for index in ordered:
+            flags[index] = flags[index] | FLAG_AMBIGUOUS if index in ambiguous else flags[index] & ~FLAG_AMBIGUOUS
+            waypoint = waypoints[index]
+            if waypoint.is_dct():
+                waypoint['wp_type'] = 'dct'
+                continue
+
+            key, points = selected[index]
+            if key in DB_ENTRY_WP_TYPES:
+                last_found = self.last_found(index)
+                if len(points) == 1 or not last_found:
+                    wp = points[0]
+                else:
+                    wp = await waypoint.find_entry(points, last_found)
+            else:
+                wp = picks.get(index)
+
+            waypoint.apply(key, wp)
+
+        self.expand_airways(resolving)
+        if pending:
+            self.stale = set()
+        elif self.stale is not None:
+            self.stale -= resolving
+
+    def expand_airways(self, indices=None):
+        """Attach the fixes flown along each airway between its entry and exit as ``fixes``.
+
+        Args:
+            indices (Set): Only airways at or next to these waypoints, every airway by default.
+        """
+        airways = self.server.database.airways
+        if not airways:
+            return
+
+        waypoints = self.waypoints
+        for position in range(1, len(self.names) - 1):
+            if indices is not None and not indices.intersection((position - 1, position, position + 1)):
+                continue
+
+            entry, airway, exit = waypoints[position - 1], waypoints[position], waypoints[position + 1]
+            if airway.get('wp_type') not in DB_ENTRY_WP_TYPES:
+                continue
+
+            fixes = airways.expand(airway.ident, entry.ident, exit.ident)
+            if fixes is not None:
+                airway['fixes'] = fixes
+            else:
+                self.extra.get(position, {}).pop('fixes', None)
 
     def toJSON(self):
-        if self.waypoints:
-            return self.waypoints
+        return [self.fields(index) for index in range(len(self.names))]
+
 
-        return self.route
+# Plan fields holding an airport ident, looked up into ``plan['airports']``.
+AIRPORT_FIELDS = ['departure', 'destination', 'alternate']
+
+# Relative difference between a given and a measured plan value flagged as a mismatch.
+MISMATCH_RATIOS = {'distance': 0.1, 'air_time': 0.2}
+
+# Plan fields serialized on their own, every other field goes in the header section.
+PAYLOAD_SECTIONS = ['airports', 'route', 'geometry']
+HEADER_SECTION = 'header'
+
+
+def plan_quantity(value):
+    """ Plan value as a number to compare, minutes for ``time_format`` values. """
+    if isinstance(value, dict):
+        return value['hours'] * 60 + value['minutes']
+    return value
 
 
 class Plan:
     def __init__(self, plan, server):
         self.server = server
-        parsed = model_parser(plan, MODEL, server=server)
+        parsed = PLAN_PARSER.parse(plan, server=server)
         self.plan = parsed[0]
         self.errors = parsed[1]
         if self.errors:
             print(f'Parser errors: {self.errors}')
 
+        # Values update_geometry filled in, replaced again when the route changes.
+        self.filled = {}
+
+        # Serialized payload sections, see ``payload``.
+        self.payloads = {}
+
+        # Held while ``refresh`` changes the plan, edits are applied one at a time.
+        self.lock = asyncio.Lock()
+
         if 'created_datetime' not in self.plan:
             self.plan['created_datetime'] = datetime.utcnow()
 
@@ -385,40 +1105,244 @@ class Plan:
         logger.debug('Plan Update Called:')
         logger.debug(plan_data)
 
-        parsed = model_parser(plan_data, MODEL, server=server)
+        parsed = PLAN_PARSER.parse(plan_data, server=self.server)
         parsed_data = parsed[0]
         self.errors = parsed[1]
         if self.errors:
             logger.warning(self.errors)
 
+        previous_route = self.plan.get('route')
+        route = parsed_data.get('route')
+        changed = [key for key in parsed_data if key in PAYLOAD_SECTIONS]
+        if route is not None and previous_route is not None:
+            route.carry_enrichment(previous_route)
+            if route.same_as(previous_route):
+                # Sent again as it was, its serialized payload still holds.
+                changed.remove('route')
+
+        previous_airports = self.airport_idents()
         self.plan.update(parsed_data)
         self.plan['updated_datetime'] = datetime.utcnow()
+        self.invalidate(HEADER_SECTION, *changed)
+
+        # The airports anchor the ends of the route.
+        route = self.plan['route']
+        airports = self.airport_idents()
+        if route.stale is not None and len(route):
+            if airports.get('departure') != previous_airports.get('departure'):
+                route.mark_stale([0])
+            if airports.get('destination') != previous_airports.get('destination'):
+                route.mark_stale([len(route) - 1])
 
         return parsed[1]
 
+    def airport_idents(self):
+        """ Airport fields of the plan as looked up, stripped and upper case. """
+        idents = {}
+        for key in AIRPORT_FIELDS:
+            ident = self.get(key)
+            if isinstance(ident, str) and ident.strip():
+                idents[key] = ident.strip().upper()
+
+        return idents
+
+    def enrichment_key(self):
+        """Content key of the enrichment result, ``None`` when results cannot be cached.
+
+        Made of the normalized airport idents, the route tokens with the coordinates they
+        came with and the navdata build id, so a rebuilt database never serves old results.
+        """
+        build_id = self.server.database.build_id
+        if build_id is None:
+            return None
+
+        airports = tuple(self.airport_idents().get(key) for key in AIRPORT_FIELDS)
+        return (build_id, airports, self.plan['route'].enrichment_key())
+
+    async def refresh(self, plan_data):
+        """Apply an edit and resolve what it changed, on the server loop like every other plan change.
+
+        Callers on other threads hand over the edited fields only and never touch the route
+        while it is being resolved.
+
+        Args:
+            plan_data (Dict): Plan fields as ``update`` takes them.
+
+        Returns:
+            List: Parse errors of the edit.
+        """
+        async with self.lock:
+            errors = self.update(plan_data)
+            await self.populate_rich_data()
+            return errors
+
     async def populate_rich_data(self):
-        ap_data = {}
-        departure = self.get('departure')
-        if departure:
-            ap_data['departure'] = await self.server.database.airport_from_ident(departure)
+        """Look up the plan's airports and resolve its route.
+
+        The airport query and the route candidate fetch run together; only picking fixes
+        along the route has to wait for the departure and destination positions. Results
+        are kept in the server's ``enrichment_cache``, a plan posted again is filled from it
+        without any lookup.
+
+        After ``update`` only the waypoints the edit made ``stale`` are resolved again.
+        """
+        await self.server.database.check_data_version()
+        cache = self.server.enrichment_cache
+        route = self.plan['route']
+        # Only a route never enriched still holds just the coordinates it came with.
+        cache_key = self.enrichment_key() if route.stale is None else None
+        cached = cache.get(cache_key, MISSING) if cache_key is not None else MISSING
+        if cached is not MISSING:
+            airports, enrichment = cached
+            self.set_airports({name: dict(airport) if airport else airport for name, airport in airports.items()})
+            route.restore_enrichment(enrichment)
+            self.invalidate('route')
+            self.update_geometry()
+            return
 
-        destination = self.get('destination')
+        idents = self.airport_idents()
+        airports, candidates = await asyncio.gather(
+            self.server.database.airports_from_idents(idents.values()),
+            route.fetch_candidates()
+        )
+
+        ap_data = {key: airports.get(ident) for key, ident in idents.items()}
+        self.set_airports(ap_data)
+
+        if route.stale is None or route.stale:
+            self.invalidate('route')
+        await route.enrich(departure=ap_data.get('departure'), destination=ap_data.get('destination'), candidates=candidates)
+        self.update_geometry()
+
+        if cache_key is not None:
+            cache.set(cache_key, [{name: dict(airport) if airport else airport for name, airport in ap_data.items()}, route.enrichment()])
+
+    def set_airports(self, airports):
+        """ Store looked up airports, their payload section is only dropped when they differ. """
+        if self.plan.get('airports') != airports:
+            self.invalidate('airports')
+        self.plan['airports'] = airports
+
+    def update_geometry(self):
+        """Measure the route flown from the departure to the destination airport.
+
+        ``plan['geometry']`` gets the total distance and time en route, and per leg the great
+        circle distance, initial true course, cumulative distance and time at ``cruise_speed``.
+        ``distance`` and ``air_time`` are filled in when the plan has none, given values far
+        from the measured ones are listed in ``mismatches``. Both only once every waypoint resolved.
+        """
+        route = self.plan['route']
+        names, latitudes, longitudes = route.flown_path()
+        airports = self.plan.get('airports') or {}
+        departure = server.disambiguation.airport_position(airports.get('departure'))
+        if departure:
+            names.insert(0, airports['departure']['ident'])
+            latitudes = numpy.concatenate([[departure[0]], latitudes])
+            longitudes = numpy.concatenate([[departure[1]], longitudes])
+        destination = server.disambiguation.airport_position(airports.get('destination'))
         if destination:
-            ap_data['destination'] = await self.server.database.airport_from_ident(destination)
+            names.append(airports['destination']['ident'])
+            latitudes = numpy.concatenate([latitudes, [destination[0]]])
+            longitudes = numpy.concatenate([longitudes, [destination[1]]])
+
+        distances, courses = server.geo.leg_geometry(latitudes, longitudes)
+        cumulative = numpy.cumsum(distances)
+        total = float(cumulative[-1]) if len(cumulative) else 0.0
+        speed = self.get('cruise_speed')
+        times = distances * (60 / speed) if speed and speed > 0 else None
+        unresolved = int(numpy.count_nonzero(numpy.frombuffer(bytes(route.flags), dtype=numpy.uint8) & FLAG_NOT_IN_DATABASE))
+        geometry = {
+            'distance_nm': total,
+            'ete_minutes': total * 60 / speed if times is not None else None,
+            'unresolved': unresolved,
+            'legs': {
+                'from': names[:-1],
+                'to': names[1:],
+                'distance_nm': distances.tolist(),
+                'course_deg': courses.tolist(),
+                'cumulative_nm': cumulative.tolist(),
+                'ete_minutes': times.tolist() if times is not None else None
+            },
+            'mismatches': {}
+        }
+        self.plan['geometry'] = geometry
+        self.invalidate('geometry')
+        if unresolved or len(distances) == 0:
+            return
 
-        alternate = self.get('alternate')
-        if destination:
-            ap_data['alternate'] = await self.server.database.airport_from_ident(alternate)
+        measured = {'distance': round(total)}
+        if times is not None:
+            minutes = round(geometry['ete_minutes'])
+            measured['air_time'] = {'hours': minutes // 60, 'minutes': minutes % 60}
+
+        for key, value in measured.items():
+            given = self.get(key)
+            if given is None or given == self.filled.get(key):
+                if given != value:
+                    self.invalidate(HEADER_SECTION)
+                self.plan[key] = value
+                self.filled[key] = value
+                continue
+
+            # A route measured at zero, like a local flight back to its departure, gives no scale to compare with.
+            if not plan_quantity(value):
+                continue
+            if abs(plan_quantity(given) - plan_quantity(value)) > MISMATCH_RATIOS[key] * plan_quantity(value):
+                geometry['mismatches'][key] = {'given': given, 'measured': value}
+                logger.warning(f'Plan {key} {given} is far from the measured {value}.')
+
+    def invalidate(self, *sections):
+        """ Drop serialized payload sections after their fields changed, every section when none are given. """
+        if not sections:
+            self.payloads.clear()
+        for section in sections:
+            self.payloads.pop(section, None)
+
+    def section_payload(self, section):
+        """JSON bytes of one payload section, serialized again only after it was invalidated.
+
+        Args:
+            section (str): One of PAYLOAD_SECTIONS, or HEADER_SECTION for all other plan fields.
+
+        Returns:
+            bytes: JSON document.
+        """
+        payload = self.payloads.get(section)
+        if payload is None:
+            if section == HEADER_SECTION:
+                value = {key: value for key, value in self.plan.items() if key not in PAYLOAD_SECTIONS}
+            else:
+                value = self.plan[section]
+            payload = dumps(value)
+            self.payloads[section] = payload
+
+        return payload
 
-        self.plan['airports'] = ap_data
+    def parsed_payload(self):
+        """ JSON bytes of the parsed plan fields, joined from the section payloads. """
+        members = []
+        header = self.section_payload(HEADER_SECTION)[1:-1]
+        if header:
+            members.append(header)
+        for section in PAYLOAD_SECTIONS:
+            if section in self.plan:
+                members.append(b'"%s":%s' % (section.encode(), self.section_payload(section)))
 
-        await self.plan['route'].enrich()
+        return b'{' + b','.join(members) + b'}'
+
+    def payload(self):
+        """JSON bytes of ``toJSON``, used for the ``post_plan`` response body.
+
+        Sections are serialized once and kept until ``update`` or ``populate_rich_data``
+        change their fields, a plan sent again costs little more than joining them.
+
+        Returns:
+            bytes: JSON document.
+        """
+        return b'{"parsed":%s,"parser_errors":%s}' % (self.parsed_payload(), dumps(self.errors))
 
     def json(self):
-        return json.dumps({
-            'plan': self.plan,
-            'errors': self.errors
-        }, default=json_encoder)
+        return (b'{"plan":%s,"errors":%s}' % (self.parsed_payload(), dumps(self.errors))).decode()
 
     def toJSON(self):
         return {
@@ -429,6 +1353,11 @@ class Plan:
     def get(self, key, default=None):
         return self.plan.get(key, default)
 
+    def set(self, key, value):
+        """ Set one plan field, dropping the payload section holding it. """
+        self.plan[key] = value
+        self.invalidate(key if key in PAYLOAD_SECTIONS else HEADER_SECTION)
+
     def route_to_str(self, include_sid_star=True, open_sid_star=False):
         points = []
         sid_star_field = 'route' if open_sid_star else 'name'
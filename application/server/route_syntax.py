@@ -0,0 +1,166 @@
+"""
+ICAO route syntax, read before any navdata lookup.
+
+A route string is split on any run of whitespace and every token is classified in the same
+pass with a single precompiled pattern, so only tokens which can name a fix or an airway are
+looked up. Tokens repeat across routes and every edit tokenizes the route again, so what a
+token reads as is cached by its text.
+"""
+import functools
+import re
+import server.coordinates
+
+DCT = 'dct'
+SPEED_LEVEL = 'speed_level'
+POSITION = 'position'
+PROCEDURE = 'procedure'
+MARKER = 'marker'
+FIX = 'fix'
+AIRWAY = 'airway'
+OTHER = 'other'
+
+# Kind codes stored per waypoint, 0 is never used so a code is always truthy.
+TOKEN_KINDS = [None, DCT, SPEED_LEVEL, POSITION, PROCEDURE, MARKER, FIX, AIRWAY, OTHER]
+TOKEN_KIND_CODES = {kind: code for code, kind in enumerate(TOKEN_KINDS) if kind}
+
+# Kinds resolved against the navdata, everything else is read from the token itself.
+LOOKUP_KINDS = {FIX, AIRWAY}
+
+SPEED = r'[NK]\d{4}|M\d{3}'
+LEVEL = r'[FA]\d{3}|[SM]\d{4}|VFR'
+COORDINATES = r'\d{2}[NS]\d{3}[EW]|\d{4}[NS]\d{5}[EW]|\d{6}[NS]\d{7}[EW]|\d{2}[NESW]\d{2}|\d{4}[NESW]|\d{2}[NS]\d{2}[EW]'
+IDENT = r'[A-Z0-9]{1,7}'
+
+# Alternatives in the order they win, the matching group names the kind.
+TOKEN_SYNTAX = [
+    (DCT, r'DCT'),
+    (SPEED_LEVEL, rf'(?:{SPEED})(?:{LEVEL})'),
+    (MARKER, r'VFR|IFR|OAT|GAT|T'),
+    (PROCEDURE, r'SID|STAR'),
+    (POSITION, COORDINATES),
+    (AIRWAY, r'[A-Z]{1,2}\d{1,4}[A-Z]?'),
+    (FIX, IDENT)
+]
+# A point may carry a speed/level change like ``DVR/N0450F350``, tokens which do not match are OTHER.
+TOKEN_PATTERN = re.compile(
+    '(?:' + '|'.join(f'(?P<{kind}>{pattern})' for kind, pattern in TOKEN_SYNTAX) + rf')(?:/(?:{SPEED})(?:{LEVEL}))?',
+    re.IGNORECASE
+)
+SPEED_LEVEL_PATTERN = re.compile(rf'(?P<speed>{SPEED})(?P<level>{LEVEL})', re.IGNORECASE)
+
+# SID and STAR designators, only read as such next to the airports.
+PROCEDURE_PATTERN = re.compile(r'[A-Z]{3,5}\d[A-Z]?', re.IGNORECASE)
+
+# Kinds which can be the point of a speed/level change, an airway ident there is a fix.
+CHANGE_KINDS = {POSITION: POSITION, FIX: FIX, AIRWAY: FIX}
+
+# Distinct token texts whose reading is kept.
+TOKEN_CACHE_SIZE = 65536
+
+FEET_PER_METRE = 1 / 0.3048
+KNOTS_PER_KMH = 1 / 1.852
+
+
+class Token:
+    """
+    One route token as read from the route string.
+
+    Initiates:
+        text: the token as written.
+        kind: one of TOKEN_KINDS.
+        ident: the point or airway name looked up, the point of a ``POINT/N0450F350`` change.
+        speed: knots of a speed/level group or change, ``None`` without one or for Mach numbers.
+        altitude: feet of a speed/level group or change, ``None`` without one or for VFR.
+    """
+    __slots__ = ('text', 'kind', 'ident', 'speed', 'altitude')
+
+    def __init__(self, text, kind, ident=None, speed=None, altitude=None):
+        self.text = text
+        self.kind = kind
+        self.ident = ident if ident is not None else text
+        self.speed = speed
+        self.altitude = altitude
+
+    def __repr__(self):
+        return f'Token({self.text!r}, {self.kind!r})'
+
+
+def speed_level(group):
+    """Read a speed/level group like N0450F350, K0830S1130 or M082VFR.
+
+    Returns:
+        List: [knots, feet], either ``None`` when the group does not give one.
+    """
+    match = SPEED_LEVEL_PATTERN.fullmatch(group)
+    speed, level = match.group('speed').upper(), match.group('level').upper()
+
+    knots = None
+    if speed[0] == 'N':
+        knots = int(speed[1:])
+    elif speed[0] == 'K':
+        knots = round(int(speed[1:]) * KNOTS_PER_KMH)
+
+    feet = None
+    if level[0] in 'FA':
+        feet = int(level[1:]) * 100
+    elif level[0] in 'SM':
+        feet = round(int(level[1:]) * 10 * FEET_PER_METRE)
+
+    return [knots, feet]
+
+
+@functools.lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def read(text):
+    """Read one token on its own, without the tokens around it.
+
+    Returns:
+        Tuple: (kind, ident, speed, altitude) as taken by ``Token``.
+    """
+    match = TOKEN_PATTERN.fullmatch(text)
+    if match is None:
+        return (OTHER, None, None, None)
+
+    kind = match.lastgroup
+    ident, _, group = text.partition('/')
+    if kind == POSITION:
+        try:
+            server.coordinates.decode_position(ident)
+        except server.coordinates.CoordinateError:
+            return (OTHER, None, None, None)
+
+    if group:
+        kind = CHANGE_KINDS.get(kind)
+        if kind is None:
+            return (OTHER, None, None, None)
+        return (kind, ident, *speed_level(group))
+
+    if kind == SPEED_LEVEL:
+        return (kind, None, *speed_level(text))
+
+    return (kind, None, None, None)
+
+
+def classify(text):
+    """ Read one token, see ``Token``. """
+    return Token(text, *read(text))
+
+
+def tokenize(route):
+    """Split a route string into classified tokens.
+
+    Any run of whitespace separates tokens. SID and STAR designators are recognised as the
+    first point after the opening speed/level group and as the last token.
+
+    Args:
+        route (str): Route as filed, like ``N0450F350 DET1J DET L6 DVR UL9 KONAN``.
+
+    Returns:
+        List: ``Token`` per route item, in order.
+    """
+    tokens = [Token(text, *read(text)) for text in route.split()]
+    first = 1 if tokens and tokens[0].kind == SPEED_LEVEL else 0
+    for token in tokens[first:first + 1] + tokens[-1:]:
+        if token.kind == FIX and PROCEDURE_PATTERN.fullmatch(token.text):
+            token.kind = PROCEDURE
+
+    return tokens
@@ -0,0 +1,167 @@
+import bisect
+import math
+import mmap
+import os
+import struct
+from loguru import logger
+from server.navdata import record_type
+
+# Must match the layout written by data/openairports.py.
+SNAPSHOT_MAGIC = b'FSLSNAP\0'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<8sIIII32s')
+SNAPSHOT_SOURCES = ['waypoint', 'navaid']
+
+Candidate = record_type('Candidate', ['source', 'ident', 'latitude_deg', 'longitude_deg', 'start_ident'])
+
+
+def aligned(size):
+    return (size + 7) // 8 * 8
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class IdentTable:
+    """ Sorted fixed width idents read straight from the mapped file, for ``bisect``. """
+    def __init__(self, buffer, position, width, count):
+        self.buffer = buffer
+        self.position = position
+        self.width = width
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        start = self.position + index * self.width
+        return self.buffer[start:start + self.width]
+
+
+class NavdataSnapshot:
+    """
+    Memory mapped, read-only view of the fix coordinate snapshot.
+
+    Nothing is loaded up front, pages are mapped on demand and shared
+    between every process that opens the same file.
+
+    Initiates:
+        path: snapshot file path.
+        build_id: build id of the database the snapshot was written from.
+        sources: sources the snapshot can answer for.
+    """
+    sources = SNAPSHOT_SOURCES
+
+    def __init__(self, path):
+        self.path = path
+        self.build_id = None
+        self._file = None
+        self._mmap = None
+
+    def open(self):
+        self._file = open(self.path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, ident_width, ident_count, record_count, build_id = SNAPSHOT_HEADER.unpack_from(self._mmap)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise SnapshotError(f'Unsupported snapshot {self.path}: {magic} v{version}')
+
+            view = self._view = memoryview(self._mmap)
+            position = aligned(SNAPSHOT_HEADER.size)
+            idents_size = ident_width * ident_count
+            self._idents = IdentTable(self._mmap, position, ident_width, ident_count)
+            position += aligned(idents_size)
+            self._offsets = view[position:position + (ident_count + 1) * 4].cast('I')
+            position += aligned((ident_count + 1) * 4)
+            self._latitudes = view[position:position + record_count * 8].cast('d')
+            position += aligned(record_count * 8)
+            self._longitudes = view[position:position + record_count * 8].cast('d')
+            position += aligned(record_count * 8)
+            self._sources = view[position:position + record_count]
+        except (ValueError, struct.error, SnapshotError):
+            self.close()
+            raise
+
+        self.build_id = build_id.decode()
+        self.ident_width = ident_width
+        logger.debug(f'Navdata snapshot {self.path} mapped: {ident_count} idents, {record_count} records')
+
+    def close(self):
+        # Views into the map have to be released before the map itself can close.
+        for attr in ['_offsets', '_latitudes', '_longitudes', '_sources', '_view']:
+            item = getattr(self, attr, None)
+            if item is not None:
+                item.release()
+                setattr(self, attr, None)
+        self._idents = None
+
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def lookup(self, ident):
+        """Find every fix for an ident.
+
+        Returns:
+            Dict: {source: [Candidate]} in source precedence order, empty when not found.
+        """
+        key = ident.encode()
+        if len(key) > self.ident_width:
+            return {}
+
+        key = key.ljust(self.ident_width, b'\0')
+        index = bisect.bisect_left(self._idents, key)
+        if index == len(self._idents) or self._idents[index] != key:
+            return {}
+
+        found = {}
+        for record in range(self._offsets[index], self._offsets[index + 1]):
+            latitude = self._latitudes[record]
+            longitude = self._longitudes[record]
+            source = SNAPSHOT_SOURCES[self._sources[record]]
+            found.setdefault(source, []).append(Candidate(
+                source,
+                ident,
+                None if math.isnan(latitude) else latitude,
+                None if math.isnan(longitude) else longitude,
+                None
+            ))
+
+        return found
+
+    def resolve_idents(self, idents):
+        resolved = {}
+        for ident in set(idents):
+            found = self.lookup(ident)
+            if found:
+                resolved[ident] = found
+
+        return resolved
+
+
+def open_snapshot(path, build_id):
+    """Open a snapshot if it exists and was written for the given database build.
+
+    Returns:
+        NavdataSnapshot: or None when missing, unreadable or stale.
+    """
+    if not build_id or not os.path.isfile(path):
+        return None
+
+    snapshot = NavdataSnapshot(path)
+    try:
+        snapshot.open()
+    except (OSError, ValueError, struct.error, SnapshotError) as exc:
+        logger.warning(f'Navdata snapshot {path} not usable, falling back to SQLite: {exc}')
+        return None
+
+    if snapshot.build_id != build_id:
+        logger.warning(f'Navdata snapshot {path} is stale, falling back to SQLite.')
+        snapshot.close()
+        return None
+
+    return snapshot
@@ -1,10 +1,55 @@
+import argparse
+import codecs
+import collections
+import concurrent.futures
+import contextlib
 import csv
+import io
 import os
+import pathlib
+import struct
+import time
+import urllib.parse
+import uuid
 import aiohttp
 import asyncio
 import aiosqlite
+import xplane
 
 DATABASE = 'data.db'
+SNAPSHOT = 'data.snap'
+
+# Full builds are written next to the live files with this suffix and renamed over them when valid.
+STAGING_SUFFIX = '.staging'
+
+# A staged table with fewer rows than this share of the live table is taken as a broken download.
+MIN_ROW_RATIO = 0.5
+
+# Rows inserted per executemany and transaction while streaming a CSV.
+CHUNK_ROWS = 5000
+
+# Bytes read from a download at a time.
+READ_SIZE = 65536
+
+# Bytes of a local CSV handed to a parser process at a time.
+PARSE_CHUNK_SIZE = 4194304
+
+# Parsed chunks per table waiting for the writer, bounds memory when inserts fall behind.
+PARSE_AHEAD = 4
+
+# Binary snapshot of fix coordinates, read by server/snapshot.py. Bump the version on any layout change.
+# Layout, little endian, every section starts 8 byte aligned:
+#   header: magic, version, ident width, ident count, record count, build id
+#   idents: ident count * ident width bytes, sorted, NUL padded
+#   offsets: (ident count + 1) * uint32, first record of each ident
+#   latitudes, longitudes: record count * float64, NaN when unknown
+#   sources: record count * uint8, index into FIX_SOURCES
+SNAPSHOT_MAGIC = b'FSLSNAP\0'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<8sIIII32s')
+
+# Tables holding fixes with coordinates, by candidate source name.
+FIX_SOURCES = [('waypoint', 'waypoints'), ('navaid', 'navaids')]
 
 AIRPORTS_URL = 'https://ourairports.com/data/airports.csv'
 AIRPORTS_HEADERS = [
@@ -86,40 +131,907 @@ RUNWAYS_HEADERS = [
     'he_displaced_threshold_ft'
 ]
 
+# Ident each table's rows belong to, recorded when rows change.
+IDENT_COLUMNS = {
+    'airports': 'ident',
+    'navaids': 'ident',
+    'airport_frequencies': 'airport_ident',
+    'runways': 'airport_ident'
+}
+
+SOURCES = [
+    ('airports', AIRPORTS_URL, AIRPORTS_HEADERS),
+    ('navaids', NAVAIDS_URL, NAVAIDS_HEADERS),
+    ('airport_frequencies', AIRPORT_FREQUENCIES_URL, AIRPORT_FREQUENCIES_HEADERS),
+    ('runways', RUNWAYS_URL, RUNWAYS_HEADERS)
+]
+
+# Columns not listed here are stored as TEXT.
+COLUMN_TYPES = {
+    'id': 'INTEGER PRIMARY KEY',
+    'airport_ref': 'INTEGER',
+    'latitude_deg': 'REAL',
+    'longitude_deg': 'REAL',
+    'elevation_ft': 'INTEGER',
+    'frequency_khz': 'INTEGER',
+    'frequency_mhz': 'REAL',
+    'dme_frequency_khz': 'INTEGER',
+    'dme_latitude_deg': 'REAL',
+    'dme_longitude_deg': 'REAL',
+    'dme_elevation_ft': 'INTEGER',
+    'slaved_variation_deg': 'REAL',
+    'magnetic_variation_deg': 'REAL',
+    'length_ft': 'INTEGER',
+    'width_ft': 'INTEGER',
+    'lighted': 'INTEGER',
+    'closed': 'INTEGER',
+    'le_latitude_deg': 'REAL',
+    'le_longitude_deg': 'REAL',
+    'le_elevation_ft': 'INTEGER',
+    'le_heading_degT': 'REAL',
+    'le_displaced_threshold_ft': 'INTEGER',
+    'he_latitude_deg': 'REAL',
+    'he_longitude_deg': 'REAL',
+    'he_elevation_ft': 'INTEGER',
+    'he_heading_degT': 'REAL',
+    'he_displaced_threshold_ft': 'INTEGER',
+    'start_type': 'INTEGER',
+    'start_latitude_deg': 'REAL',
+    'start_longitude_deg': 'REAL',
+    'end_type': 'INTEGER',
+    'end_latitude_deg': 'REAL',
+    'end_longitude_deg': 'REAL',
+    'base_fl': 'INTEGER',
+    'top_fl': 'INTEGER'
+}
+
+TYPE_CONVERTERS = {
+    'INTEGER': int,
+    'INTEGER PRIMARY KEY': int,
+    'REAL': float
+}
+
+# Columns the server looks rows up by.
+TABLE_INDEXES = {
+    'airports': ['ident', 'gps_code', 'iata_code'],
+    'navaids': ['ident'],
+    'airport_frequencies': ['airport_ident'],
+    'runways': ['airport_ident'],
+    'waypoints': ['ident'],
+    'routes': ['ident', 'start_ident'],
+    'high_routes': ['ident', 'start_ident']
+}
+
+# Tables only built from X-Plane files, a build without them keeps the live database's copies.
+XPLANE_TABLES = ['waypoints', *xplane.AIRWAY_TABLES.values()]
+
+# OurAirports navaid types an earth_awy.dat endpoint type code can refer to.
+AIRWAY_NAVAID_TYPES = {
+    xplane.NDB_TYPE: ['NDB', 'NDB-DME'],
+    xplane.VHF_TYPE: ['VOR', 'VOR-DME', 'VORTAC', 'TACAN', 'DME']
+}
+
+
+def convert_value(column, value):
+    """ Convert a CSV string to the column's type. Empty strings become NULL. """
+    if value == '':
+        return None
+
+    converter = TYPE_CONVERTERS.get(COLUMN_TYPES.get(column))
+    if not converter:
+        return value
+
+    try:
+        return converter(value)
+    except ValueError:
+        return value
+
+
+class LineFeed:
+    """ Iterator csv.reader pulls complete records from, filled as the download progresses. """
+    def __init__(self):
+        self.lines = collections.deque()
+
+    def push(self, line):
+        self.lines.append(line)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def read_csv_rows(response):
+    """ Yield batches of parsed CSV rows while the response body is still arriving. """
+    decoder = codecs.getincrementaldecoder(response.charset or 'utf-8')()
+    feed = LineFeed()
+    reader = csv.reader(feed)
+    partial_line = ''
+    record = ''
+    async for block in response.content.iter_chunked(READ_SIZE):
+        lines = (partial_line + decoder.decode(block)).split('\n')
+        partial_line = lines.pop()
+        for line in lines:
+            record += line + '\n'
+            # An odd number of quotes means a quoted field continues on the next line.
+            if record.count('"') % 2 == 0:
+                feed.push(record)
+                record = ''
+
+        rows = [row for row in reader if row]
+        if rows:
+            yield rows
+
+    record += partial_line + decoder.decode(b'', final=True)
+    if record:
+        feed.push(record)
+        rows = [row for row in reader if row]
+        if rows:
+            yield rows
+
+
+def insert_query(table_name, table_headers):
+    q_marks = ['?' for x in range(len(table_headers))]
+    return f'INSERT INTO {table_name} ({", ".join(table_headers)}) VALUES ({", ".join(q_marks)});'
+
+
+def column_positions(header, table_headers):
+    """ Pair every table column with its index in the CSV header, None when the file lacks it. """
+    positions = {name: index for index, name in enumerate(header)}
+    return [(column, positions.get(column)) for column in table_headers]
+
+
+def convert_row(row, columns):
+    return tuple(
+        convert_value(column, row[index] if index is not None and index < len(row) else '')
+        for column, index in columns
+    )
+
+
+async def insert_rows(db, table_name, table_headers, rows):
+    """Insert CSV rows in chunked transactions, never holding more than one chunk.
+
+    Args:
+        rows (AsyncIterator): Batches of CSV rows, the first row being the header.
+
+    Returns:
+        int: Number of rows inserted.
+    """
+    query = insert_query(table_name, table_headers)
+    count = 0
+    columns = None
+    chunk = []
+    async for batch in rows:
+        for row in batch:
+            if columns is None:
+                columns = column_positions(row, table_headers)
+                continue
+
+            chunk.append(convert_row(row, columns))
+
+        if len(chunk) >= CHUNK_ROWS:
+            await db.executemany(query, chunk)
+            await db.commit()
+            count += len(chunk)
+            chunk = []
+
+    if chunk:
+        await db.executemany(query, chunk)
+        await db.commit()
+        count += len(chunk)
+
+    return count
+
+
+def split_records(path, chunk_size=PARSE_CHUNK_SIZE):
+    """Cut a local CSV file into byte ranges which start and end on record boundaries.
+
+    Returns:
+        List: [header row, [(start, end)]] with the ranges covering every record after the header.
+    """
+    with open(path, 'rb') as source:
+        header = next(csv.reader([source.readline().decode('utf-8-sig')]))
+        ranges = []
+        start = offset = source.tell()
+        odd_quotes = False
+        while True:
+            block = source.read(chunk_size)
+            if not block:
+                break
+
+            # Only a newline outside quotes ends a record, look for the last one in the block.
+            newline = block.rfind(b'\n')
+            while newline != -1 and (odd_quotes + block.count(b'"', 0, newline)) % 2:
+                newline = block.rfind(b'\n', 0, newline)
+            if newline != -1:
+                ranges.append((start, offset + newline + 1))
+                start = offset + newline + 1
+
+            odd_quotes = bool((odd_quotes + block.count(b'"')) % 2)
+            offset += len(block)
+
+        if start < offset:
+            ranges.append((start, offset))
+
+    return [header, ranges]
+
+
+def parse_range(path, start, end, columns):
+    """ Parse and convert the records in one byte range of a CSV file. Runs in a worker process. """
+    started = time.perf_counter()
+    with open(path, 'rb') as source:
+        source.seek(start)
+        text = source.read(end - start).decode('utf-8')
+
+    rows = [convert_row(row, columns) for row in csv.reader(io.StringIO(text, newline='')) if row]
+    return rows, time.perf_counter() - started
+
+
+async def load_file(db, pool, writer, path, table_name, table_headers, timings):
+    """Parse a local CSV in the process pool and insert its rows in file order.
+
+    Args:
+        pool (concurrent.futures.ProcessPoolExecutor): Parser processes.
+        writer (asyncio.Lock): Held while inserting, SQLite takes one writer at a time.
+        timings (Dict): stage name: seconds, added to.
+
+    Returns:
+        int: Number of rows inserted.
+    """
+    loop = asyncio.get_running_loop()
+    with stage(timings, 'load: split'):
+        header, ranges = split_records(path)
+
+    columns = column_positions(header, table_headers)
+    query = insert_query(table_name, table_headers)
+    pending = collections.deque()
+    count = 0
+    ranges = collections.deque(ranges)
+    while ranges or pending:
+        while ranges and len(pending) < PARSE_AHEAD:
+            start, end = ranges.popleft()
+            pending.append(loop.run_in_executor(pool, parse_range, path, start, end, columns))
+
+        rows, parse_seconds = await pending.popleft()
+        timings['load: parse (worker cpu)'] += parse_seconds
+        async with writer:
+            with stage(timings, 'load: insert'):
+                for index in range(0, len(rows), CHUNK_ROWS):
+                    await db.executemany(query, rows[index:index + CHUNK_ROWS])
+                    await db.commit()
+        count += len(rows)
+
+    return count
+
+
+@contextlib.contextmanager
+def stage(timings, name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] += time.perf_counter() - started
+
+
+def report_stages(timings):
+    print('Stage timings:')
+    for name, seconds in timings.items():
+        print(f'  {name:<26} {seconds:8.2f} s')
+
+
+def report_throughput(table_name, count, started):
+    elapsed = time.perf_counter() - started
+    print(f'{table_name}: {count} rows in {elapsed:.2f} s, {count / elapsed if elapsed else 0:.0f} rows/s')
+
 
 async def fetch(session, url, db, table_name, table_headers):
+    started = time.perf_counter()
     async with session.get(url) as response:
-        csv_str = await response.text()
-        csv_data = csv.DictReader(csv_str.splitlines())
-        to_db = []
-        for col in csv_data:
-            to_db.append(tuple(col.values()))
-
-        q_marks = ['?' for x in range(len(table_headers))]
-        await db.executemany(f'INSERT INTO {table_name} ({", ".join(table_headers)}) VALUES ({", ".join(q_marks)});', to_db)
+        response.raise_for_status()
+        count = await insert_rows(db, table_name, table_headers, read_csv_rows(response))
+        await store_validators(db, table_name, url, response.headers)
+        await db.commit()
+
+    report_throughput(table_name, count, started)
+    return count
+
+
+async def create_sources_table(db):
+    await db.execute(
+        'CREATE TABLE IF NOT EXISTS sources (table_name TEXT PRIMARY KEY, url TEXT, etag TEXT, last_modified TEXT)'
+    )
+
+
+async def store_validators(db, table_name, url, headers):
+    """ Remember ETag and Last-Modified of a download for the next conditional fetch, within the caller's transaction. """
+    await db.execute(
+        'INSERT OR REPLACE INTO sources (table_name, url, etag, last_modified) VALUES (?, ?, ?, ?)',
+        (table_name, url, headers.get('ETag'), headers.get('Last-Modified'))
+    )
+
+
+async def conditional_headers(db, table_name, url):
+    async with db.execute('SELECT url, etag, last_modified FROM sources WHERE table_name=?', (table_name, )) as cursor:
+        row = await cursor.fetchone()
+
+    headers = {}
+    if not row or row[0] != url:
+        return headers
+    if row[1]:
+        headers['If-None-Match'] = row[1]
+    if row[2]:
+        headers['If-Modified-Since'] = row[2]
+    return headers
+
+
+DIFF_COUNTS = {'insert': 'inserted', 'update': 'updated', 'delete': 'deleted'}
+
+
+async def apply_diff(db, table_name, incoming, table_headers):
+    """Bring a table in line with a freshly loaded copy, touching only rows that changed.
+
+    Rows are matched by ``id``. Runs within the caller's transaction, the changed ids go to a
+    temp table of this table's own.
+
+    Returns:
+        Dict: inserted, updated and deleted row counts, and the changed ``idents``.
+    """
+    compare = ' OR '.join(f'incoming.{column} IS NOT current.{column}' for column in table_headers if column != 'id')
+    diff_ids = f'temp.{table_name}_diff_ids'
+    await db.execute(f'DROP TABLE IF EXISTS {diff_ids}')
+    await db.execute(f'CREATE TEMP TABLE {table_name}_diff_ids (id INTEGER PRIMARY KEY, kind TEXT)')
+    await db.execute(
+        f"INSERT INTO {diff_ids} SELECT incoming.id, 'insert' FROM {incoming} AS incoming "
+        f"LEFT JOIN {table_name} AS current ON current.id = incoming.id WHERE current.id IS NULL"
+    )
+    await db.execute(
+        f"INSERT INTO {diff_ids} SELECT current.id, 'delete' FROM {table_name} AS current "
+        f"LEFT JOIN {incoming} AS incoming ON incoming.id = current.id WHERE incoming.id IS NULL"
+    )
+    await db.execute(
+        f"INSERT INTO {diff_ids} SELECT incoming.id, 'update' FROM {incoming} AS incoming "
+        f"JOIN {table_name} AS current ON current.id = incoming.id WHERE {compare}"
+    )
+
+    diff = {'inserted': 0, 'updated': 0, 'deleted': 0, 'idents': set()}
+    async with db.execute(f'SELECT kind, COUNT(*) FROM {diff_ids} GROUP BY kind') as cursor:
+        for kind, count in await cursor.fetchall():
+            diff[DIFF_COUNTS[kind]] = count
+
+    ident_column = IDENT_COLUMNS.get(table_name)
+    if ident_column:
+        async with db.execute(
+            f"SELECT {ident_column} FROM {table_name} WHERE id IN (SELECT id FROM {diff_ids} WHERE kind != 'insert') "
+            f"UNION SELECT {ident_column} FROM {incoming} WHERE id IN (SELECT id FROM {diff_ids} WHERE kind != 'delete')"
+        ) as cursor:
+            diff['idents'] = {row[0] for row in await cursor.fetchall() if row[0]}
+
+    await db.execute(f"DELETE FROM {table_name} WHERE id IN (SELECT id FROM {diff_ids} WHERE kind != 'insert')")
+    await db.execute(f"INSERT INTO {table_name} SELECT * FROM {incoming} WHERE id IN (SELECT id FROM {diff_ids} WHERE kind != 'delete')")
+    await db.execute(f'DROP TABLE {diff_ids}')
+    await db.execute(f'DROP TABLE {incoming}')
+    return diff
+
+
+async def download(session, url, db, table_name, table_headers):
+    """Load one source into the temp table ``<table>_incoming`` if it changed since the last fetch.
+
+    Downloads of all sources run together, their diffs are applied afterwards one at a time
+    with ``apply_download``. Being temp tables, a failed download leaves nothing behind in the
+    live database.
+
+    Returns:
+        Dict: incoming table, exists, count, response headers and start time. None when unchanged.
+    """
+    started = time.perf_counter()
+    async with db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name, )) as cursor:
+        exists = await cursor.fetchone() is not None
+
+    headers = await conditional_headers(db, table_name, url) if exists else {}
+    incoming = f'temp.{table_name}_incoming'
+    async with session.get(url, headers=headers) as response:
+        if response.status == 304:
+            print(f'{table_name}: unchanged')
+            return None
+
+        response.raise_for_status()
+        await create_table(db, incoming, table_headers)
+        count = await insert_rows(db, incoming, table_headers, read_csv_rows(response))
+
+    return {'incoming': incoming, 'exists': exists, 'count': count, 'headers': response.headers.copy(), 'started': started}
+
+
+async def apply_download(db, url, table_name, table_headers, loaded):
+    """Bring a table in line with its ``download``, in a single transaction.
+
+    Returns:
+        Dict: as returned by ``apply_diff``.
+    """
+    await db.execute('BEGIN')
+    try:
+        if loaded['exists']:
+            diff = await apply_diff(db, table_name, loaded['incoming'], table_headers)
+        else:
+            await create_table(db, table_name, table_headers)
+            await db.execute(f'INSERT INTO {table_name} SELECT * FROM {loaded["incoming"]}')
+            await db.execute(f'DROP TABLE {loaded["incoming"]}')
+            await create_indexes(db, table_name)
+            diff = {'inserted': loaded['count'], 'updated': 0, 'deleted': 0, 'idents': None}
+
+        await store_validators(db, table_name, url, loaded['headers'])
         await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+
+    report_throughput(table_name, loaded['count'], loaded['started'])
+    print(f'{table_name}: {diff["inserted"]} inserted, {diff["updated"]} updated, {diff["deleted"]} deleted')
+    return diff
 
 
 async def create_table(db, table_name, fields):
     await db.execute(f'DROP TABLE IF EXISTS {table_name}')
-    await db.execute(f'CREATE TABLE {table_name} ({", ".join(fields)})')
+    columns = [f'{field} {COLUMN_TYPES.get(field, "TEXT")}' for field in fields]
+    await db.execute(f'CREATE TABLE {table_name} ({", ".join(columns)})')
+
+
+async def create_indexes(db, table_name):
+    for column in TABLE_INDEXES.get(table_name, []):
+        await db.execute(f'CREATE INDEX IF NOT EXISTS {table_name}_{column}_idx ON {table_name} ({column})')
+
+
+def source_url(url, base_url=None):
+    """ Point a source at another host serving the same file names, like a local mirror. """
+    if not base_url:
+        return url
+    return urllib.parse.urljoin(base_url, os.path.basename(urllib.parse.urlparse(url).path))
+
+
+def source_path(url, source_dir):
+    """ Local copy of a source, looked up by its file name. """
+    return os.path.join(source_dir, os.path.basename(urllib.parse.urlparse(url).path))
+
+
+async def load_fixes(db, path):
+    """Stream an X-Plane earth_fix.dat into the waypoints table.
+
+    Returns:
+        int: Number of rows inserted.
+    """
+    started = time.perf_counter()
+    await create_table(db, 'waypoints', xplane.WAYPOINTS_HEADERS)
+    query = insert_query('waypoints', xplane.WAYPOINTS_HEADERS)
+    count = 0
+    skipped = 0
+    for batch in xplane.batched(xplane.read_dat_records(path), CHUNK_ROWS):
+        rows, batch_skipped = xplane.waypoint_rows(batch)
+        await db.executemany(query, rows)
+        await db.commit()
+        count += len(rows)
+        skipped += batch_skipped
+
+    report_throughput('waypoints', count, started)
+    if skipped:
+        print(f'waypoints: skipped {skipped} records without valid coordinates')
+    return count
+
+
+async def load_airways(db, path):
+    """Stream an X-Plane earth_awy.dat into the routes and high_routes tables.
+
+    Returns:
+        Dict: table name: number of rows inserted.
+    """
+    started = time.perf_counter()
+    counts = {}
+    for table_name in xplane.AIRWAY_TABLES.values():
+        await create_table(db, table_name, xplane.AIRWAYS_HEADERS)
+        counts[table_name] = 0
+
+    skipped = 0
+    for batch in xplane.batched(xplane.read_dat_records(path), CHUNK_ROWS):
+        tables, batch_skipped = xplane.airway_rows(batch)
+        for table_name, rows in tables.items():
+            if rows:
+                await db.executemany(insert_query(table_name, xplane.AIRWAYS_HEADERS), rows)
+                counts[table_name] += len(rows)
+        await db.commit()
+        skipped += batch_skipped
+
+    await resolve_airway_coordinates(db)
+    for table_name, count in counts.items():
+        report_throughput(table_name, count, started)
+    if skipped:
+        print(f'airways: skipped {skipped} malformed records')
+    return counts
+
+
+async def resolve_airway_coordinates(db):
+    """Fill in endpoint coordinates of segments which only name their fixes.
+
+    Fixes are matched on ident and region. Navaids carry no region in OurAirports data,
+    so the navaid of that ident closest to the other end of the segment is taken.
+    """
+    async with db.execute("SELECT name FROM sqlite_master WHERE type='table'") as cursor:
+        tables = {row[0] for row in await cursor.fetchall()}
+    for table_name in ['waypoints', 'navaids']:
+        if table_name in tables:
+            await create_indexes(db, table_name)
+
+    for table_name in xplane.AIRWAY_TABLES.values():
+        if 'waypoints' not in tables:
+            break
+        for end in ['start', 'end']:
+            fix = (
+                f'SELECT {{column}} FROM waypoints WHERE waypoints.ident = {table_name}.{end}_ident '
+                f'AND waypoints.region = {table_name}.{end}_region ORDER BY id LIMIT 1'
+            )
+            await db.execute(
+                f'UPDATE {table_name} SET '
+                f'{end}_latitude_deg = ({fix.format(column="latitude_deg")}), '
+                f'{end}_longitude_deg = ({fix.format(column="longitude_deg")}) '
+                f'WHERE {end}_type = ? AND {end}_latitude_deg IS NULL',
+                (xplane.FIX_TYPE, )
+            )
+
+    navaids = {}
+    for navaid_type, navaid_types in AIRWAY_NAVAID_TYPES.items():
+        async with db.execute(
+            f'SELECT ident, latitude_deg, longitude_deg FROM navaids WHERE type IN ({", ".join("?" for _ in navaid_types)}) '
+            f'AND latitude_deg IS NOT NULL AND longitude_deg IS NOT NULL ORDER BY id',
+            navaid_types
+        ) as cursor:
+            for ident, latitude, longitude in await cursor.fetchall():
+                navaids.setdefault((ident, navaid_type), []).append((latitude, longitude))
+
+    for table_name in xplane.AIRWAY_TABLES.values():
+        # Ends next to a placed fix first. A segment between two navaids then gets its start
+        # placed on its own, and its end placed next to that start.
+        for condition in ['IS NOT NULL', 'IS NULL', 'IS NOT NULL']:
+            for end, other in [('start', 'end'), ('end', 'start')]:
+                async with db.execute(
+                    f'SELECT id, {end}_ident, {end}_type, {other}_latitude_deg, {other}_longitude_deg FROM {table_name} '
+                    f'WHERE {end}_type IN ({", ".join(str(code) for code in AIRWAY_NAVAID_TYPES)}) '
+                    f'AND {end}_latitude_deg IS NULL AND {other}_latitude_deg {condition}'
+                ) as cursor:
+                    rows = await cursor.fetchall()
+
+                updates = []
+                for row_id, ident, navaid_type, latitude, longitude in rows:
+                    candidates = navaids.get((ident, navaid_type))
+                    if not candidates:
+                        continue
+                    if latitude is None:
+                        closest = candidates[0]
+                    else:
+                        closest = min(candidates, key=lambda candidate: (candidate[0] - latitude) ** 2 + (candidate[1] - longitude) ** 2)
+                    updates.append((*closest, row_id))
+
+                await db.executemany(
+                    f'UPDATE {table_name} SET {end}_latitude_deg = ?, {end}_longitude_deg = ? WHERE id = ?', updates
+                )
+
+    await db.commit()
+
+
+async def load_local(db, source_dir, workers, timings):
+    """Load every source from a local directory, parsing in a pool of worker processes.
+
+    Returns:
+        List: rows inserted per source, in SOURCES order.
+    """
+    paths = [source_path(url, source_dir) for table_name, url, table_headers in SOURCES]
+    missing = [path for path in paths if not os.path.isfile(path)]
+    if missing:
+        raise BuildError(f'Missing source files: {", ".join(missing)}')
+
+    writer = asyncio.Lock()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        async def load(path, table_name, table_headers):
+            started = time.perf_counter()
+            count = await load_file(db, pool, writer, path, table_name, table_headers, timings)
+            report_throughput(table_name, count, started)
+            return count
+
+        return await asyncio.gather(*[
+            load(path, table_name, table_headers)
+            for path, (table_name, url, table_headers) in zip(paths, SOURCES)
+        ])
+
+
+def aligned(size):
+    return (size + 7) // 8 * 8
+
+
+async def write_snapshot(db, path, build_id):
+    """ Write the fix coordinate snapshot for the database's current content. """
+    async with db.execute("SELECT name FROM sqlite_master WHERE type='table'") as cursor:
+        tables = {row[0] for row in await cursor.fetchall()}
+
+    selects = [
+        f'SELECT ident, {index} AS source, rowid AS row_order, latitude_deg, longitude_deg FROM {table}'
+        for index, (source, table) in enumerate(FIX_SOURCES) if table in tables
+    ]
+    rows = []
+    if selects:
+        async with db.execute(' UNION ALL '.join(selects) + ' ORDER BY ident, source, row_order') as cursor:
+            rows = [row for row in await cursor.fetchall() if row[0]]
+
+    idents = []
+    offsets = []
+    for index, row in enumerate(rows):
+        if not idents or idents[-1] != row[0]:
+            idents.append(row[0])
+            offsets.append(index)
+    offsets.append(len(rows))
+
+    encoded_idents = [ident.encode() for ident in idents]
+    ident_width = max([len(ident) for ident in encoded_idents], default=1)
+    nan = float('nan')
 
+    with open(path, 'wb') as snapshot:
+        header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, ident_width, len(idents), len(rows), build_id.encode())
+        sections = [
+            header,
+            b''.join(ident.ljust(ident_width, b'\0') for ident in encoded_idents),
+            struct.pack(f'<{len(offsets)}I', *offsets),
+            struct.pack(f'<{len(rows)}d', *[nan if row[3] is None else row[3] for row in rows]),
+            struct.pack(f'<{len(rows)}d', *[nan if row[4] is None else row[4] for row in rows]),
+            bytes(row[1] for row in rows)
+        ]
+        for section in sections:
+            snapshot.write(section.ljust(aligned(len(section)), b'\0'))
 
-async def main():
+
+async def read_build_id(db):
+    async with db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='meta'") as cursor:
+        if not await cursor.fetchone():
+            return None
+
+    async with db.execute("SELECT value FROM meta WHERE key='build_id'") as cursor:
+        row = await cursor.fetchone()
+        return row[0] if row else None
+
+
+async def write_build_id(db, parent_build_id=None, changed_idents=None):
+    """Stamp a new build id on the database.
+
+    Args:
+        parent_build_id (str): Build the changes were applied on, for incremental updates.
+        changed_idents (Dict): table name: set of idents changed since the parent build.
+            Readers holding data of the parent build only need to drop these.
+    """
+    build_id = uuid.uuid4().hex
+    await db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+    await db.execute('CREATE TABLE IF NOT EXISTS changed_idents (table_name TEXT, ident TEXT)')
+    await db.execute('DELETE FROM changed_idents')
+    await db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('build_id', ?)", (build_id, ))
+    await db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('parent_build_id', ?)", (parent_build_id, ))
+    if changed_idents:
+        await db.executemany('INSERT INTO changed_idents (table_name, ident) VALUES (?, ?)', [
+            (table_name, ident) for table_name, idents in changed_idents.items() for ident in idents
+        ])
+    return build_id
+
+
+class BuildError(Exception):
+    pass
+
+
+async def table_counts(path, table_names):
+    """ Row count of every table present in an existing database, empty when there is none. """
+    if not os.path.isfile(path):
+        return {}
+
+    counts = {}
+    async with aiosqlite.connect(f'{pathlib.Path(path).resolve().as_uri()}?mode=ro', uri=True) as db:
+        async with db.execute("SELECT name FROM sqlite_master WHERE type='table'") as cursor:
+            tables = {row[0] for row in await cursor.fetchall()}
+        for table_name in table_names:
+            if table_name in tables:
+                async with db.execute(f'SELECT COUNT(*) FROM {table_name}') as cursor:
+                    counts[table_name] = (await cursor.fetchone())[0]
+
+    return counts
+
+
+async def validate_counts(db, loaded, live):
+    """Check a staged build before it replaces the live database.
+
+    Args:
+        loaded (Dict): table name: rows streamed in from the source.
+        live (Dict): table name: rows in the live database.
+    """
+    for table_name, count in loaded.items():
+        async with db.execute(f'SELECT COUNT(*) FROM {table_name}') as cursor:
+            stored = (await cursor.fetchone())[0]
+        if stored != count:
+            raise BuildError(f'{table_name}: {count} rows loaded but {stored} stored')
+        if not stored:
+            raise BuildError(f'{table_name}: no rows loaded')
+        if stored < live.get(table_name, 0) * MIN_ROW_RATIO:
+            raise BuildError(f'{table_name}: {stored} rows, down from {live[table_name]} in the live database')
+
+
+async def carry_tables(db, path, table_names):
+    """Copy tables the build did not produce from the live database, so the swap keeps them.
+
+    Args:
+        path (str): Live database, nothing is copied when there is none.
+        table_names (List): Tables to copy when the live database has them and the build does not.
+
+    Returns:
+        List: Names of the copied tables.
+    """
+    if not os.path.isfile(path):
+        return []
+
+    async with db.execute("SELECT name FROM sqlite_master WHERE type='table'") as cursor:
+        built = {row[0] for row in await cursor.fetchall()}
+
+    copied = []
+    await db.execute('ATTACH DATABASE ? AS live', (path, ))
+    try:
+        async with db.execute("SELECT name, sql FROM live.sqlite_master WHERE type='table'") as cursor:
+            live = {row[0]: row[1] for row in await cursor.fetchall()}
+
+        for table_name in table_names:
+            if table_name in built or table_name not in live:
+                continue
+            await db.execute(live[table_name])
+            await db.execute(f'INSERT INTO main.{table_name} SELECT * FROM live.{table_name}')
+            copied.append(table_name)
+        await db.commit()
+    finally:
+        await db.execute('DETACH DATABASE live')
+
+    for table_name in copied:
+        print(f'{table_name}: kept from the live database')
+    return copied
+
+
+def remove_files(*paths):
+    for path in paths:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+
+async def main(base_url=None, source_dir=None, workers=None, fixes=None, airways=None):
+    """Build a complete database next to the live one and swap it in once it is valid.
+
+    A running server keeps reading the live files until the rename, which replaces them
+    atomically, and then reopens its connections on the new database.
+
+    Args:
+        base_url (str): Fetch the sources from this URL instead of ourairports.com.
+        source_dir (str): Read the sources from this directory instead, without network access.
+        workers (int): Parser processes for a local import, defaults to the CPU count.
+        fixes (str): X-Plane earth_fix.dat to fill the waypoints table from, the live table is kept without it.
+        airways (str): X-Plane earth_awy.dat to fill the routes and high_routes tables from, the live
+            tables are kept without it.
+    """
+    timings = collections.defaultdict(float)
+    timings['load'] = 0.0
+    staging = f'{DATABASE}{STAGING_SUFFIX}'
+    staging_snapshot = f'{SNAPSHOT}{STAGING_SUFFIX}'
+    remove_files(staging, f'{staging}-journal', staging_snapshot)
+
+    try:
+        async with aiosqlite.connect(staging) as db:
+            await create_sources_table(db)
+            for table_name, url, table_headers in SOURCES:
+                await create_table(db, table_name, table_headers)
+
+            with stage(timings, 'load'):
+                if source_dir:
+                    counts = await load_local(db, source_dir, workers, timings)
+                else:
+                    async with aiohttp.ClientSession() as session:
+                        counts = await asyncio.gather(*[
+                            fetch(session, source_url(url, base_url), db, table_name, table_headers)
+                            for table_name, url, table_headers in SOURCES
+                        ])
+
+            loaded = dict(zip([table_name for table_name, url, table_headers in SOURCES], counts))
+            # Before the X-Plane files, airways are placed on the live fixes when only airways are given.
+            with stage(timings, 'carry'):
+                built = (['waypoints'] if fixes else []) + (list(xplane.AIRWAY_TABLES.values()) if airways else [])
+                await carry_tables(db, DATABASE, [table_name for table_name in XPLANE_TABLES if table_name not in built])
+
+            if fixes:
+                with stage(timings, 'fixes'):
+                    loaded['waypoints'] = await load_fixes(db, fixes)
+            if airways:
+                with stage(timings, 'airways'):
+                    loaded.update({
+                        table_name: count for table_name, count in (await load_airways(db, airways)).items() if count
+                    })
+
+            with stage(timings, 'validate'):
+                await validate_counts(db, loaded, await table_counts(DATABASE, list(loaded)))
+
+            with stage(timings, 'indexes'):
+                async with db.execute("SELECT name FROM sqlite_master WHERE type='table'") as cursor:
+                    tables = {row[0] for row in await cursor.fetchall()}
+                # The X-Plane tables are only there when loaded or kept from the live database.
+                for table_name in TABLE_INDEXES:
+                    if table_name in tables:
+                        await create_indexes(db, table_name)
+
+            with stage(timings, 'analyze'):
+                await db.execute('ANALYZE')
+                build_id = await write_build_id(db)
+                await db.commit()
+
+            with stage(timings, 'snapshot'):
+                await write_snapshot(db, staging_snapshot, build_id)
+    except BaseException:
+        remove_files(staging, f'{staging}-journal', staging_snapshot)
+        raise
+
+    # Snapshot first, a reader never trusts a snapshot whose build id differs from its database.
+    with stage(timings, 'swap'):
+        os.replace(staging_snapshot, SNAPSHOT)
+        os.replace(staging, DATABASE)
+    print(f'Swapped in build {build_id}')
+    report_stages(timings)
+
+
+async def update(base_url=None):
+    """ Refresh only the sources which changed, applying row level diffs. """
     async with aiosqlite.connect(DATABASE) as db:
-        await create_table(db, 'airports', AIRPORTS_HEADERS)
-        await create_table(db, 'navaids', NAVAIDS_HEADERS)
-        await create_table(db, 'airport_frequencies', AIRPORT_FREQUENCIES_HEADERS)
-        await create_table(db, 'runways', RUNWAYS_HEADERS)
+        await create_sources_table(db)
+        parent_build_id = await read_build_id(db)
 
         async with aiohttp.ClientSession() as session:
-            await asyncio.wait([
-                fetch(session, AIRPORTS_URL, db, 'airports', AIRPORTS_HEADERS),
-                fetch(session, NAVAIDS_URL, db, 'navaids', NAVAIDS_HEADERS),
-                fetch(session, AIRPORT_FREQUENCIES_URL, db, 'airport_frequencies', AIRPORT_FREQUENCIES_HEADERS),
-                fetch(session, RUNWAYS_URL, db, 'runways', RUNWAYS_HEADERS)
+            downloads = await asyncio.gather(*[
+                download(session, source_url(url, base_url), db, table_name, table_headers)
+                for table_name, url, table_headers in SOURCES
             ])
 
+        changed = {}
+        for (table_name, url, table_headers), loaded in zip(SOURCES, downloads):
+            if loaded:
+                changed[table_name] = await apply_download(db, source_url(url, base_url), table_name, table_headers, loaded)
+        if not any(diff['inserted'] or diff['updated'] or diff['deleted'] for diff in changed.values()):
+            print('Navdata is up to date.')
+            return
+
+        await db.execute('ANALYZE')
+        if all(diff['idents'] is not None for diff in changed.values()):
+            build_id = await write_build_id(db, parent_build_id, {
+                table_name: diff['idents'] for table_name, diff in changed.items()
+            })
+        else:
+            build_id = await write_build_id(db)
+        await db.commit()
+
+        # The live snapshot is memory mapped by the server, replace it rather than write over it.
+        staging_snapshot = f'{SNAPSHOT}{STAGING_SUFFIX}'
+        try:
+            await write_snapshot(db, staging_snapshot, build_id)
+        except BaseException:
+            remove_files(staging_snapshot)
+            raise
+        os.replace(staging_snapshot, SNAPSHOT)
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the navdata database from OurAirports data.')
+    parser.add_argument('--base-url', help='Fetch the CSV files from this URL instead of ourairports.com.')
+    parser.add_argument('--source-dir', help='Read the CSV files from this directory instead, no network needed.')
+    parser.add_argument('--workers', type=int, help='Parser processes for --source-dir, defaults to the CPU count.')
+    parser.add_argument('--fixes', help='X-Plane earth_fix.dat to load the waypoints table from.')
+    parser.add_argument('--airways', help='X-Plane earth_awy.dat to load the routes and high_routes tables from.')
+    parser.add_argument('--update', action='store_true', help='Only fetch changed files and apply the differences.')
+    args = parser.parse_args()
+    if args.update and (args.source_dir or args.fixes or args.airways):
+        parser.error('--update fetches from URLs, it cannot be combined with --source-dir, --fixes or --airways')
+
     loop = asyncio.get_event_loop()
-    loop.run_until_complete(main())
+    if args.update:
+        loop.run_until_complete(update(args.base_url))
+    else:
+        loop.run_until_complete(main(args.base_url, args.source_dir, args.workers, args.fixes, args.airways))
@@ -0,0 +1,180 @@
+import itertools
+import numpy
+
+# earth_fix.dat: lat lon ident, from version 1100 on followed by terminal area, region,
+# and from 1101 on by the ARINC 424 waypoint type and a name.
+WAYPOINTS_HEADERS = [
+    'id',
+    'ident',
+    'latitude_deg',
+    'longitude_deg',
+    'airport_ident',
+    'region',
+    'waypoint_type',
+    'name'
+]
+
+# earth_awy.dat segments, one row per airway the segment belongs to.
+AIRWAYS_HEADERS = [
+    'id',
+    'ident',
+    'start_ident',
+    'start_region',
+    'start_type',
+    'start_latitude_deg',
+    'start_longitude_deg',
+    'end_ident',
+    'end_region',
+    'end_type',
+    'end_latitude_deg',
+    'end_longitude_deg',
+    'direction',
+    'base_fl',
+    'top_fl'
+]
+
+# Airway level: table.
+AIRWAY_TABLES = {'1': 'routes', '2': 'high_routes'}
+
+# Terminal area of fixes which belong to no airport.
+ENROUTE = 'ENRT'
+
+# Fix type codes of earth_awy.dat 1100 endpoints.
+FIX_TYPE = 11
+NDB_TYPE = 2
+VHF_TYPE = 3
+
+END_OF_FILE = '99'
+
+
+def read_dat_records(path):
+    """ Yield the split records of an X-Plane .dat file, without its header and end marker. """
+    with open(path, encoding='utf-8', errors='replace') as source:
+        # Origin line ('I' or 'A') and version line.
+        source.readline()
+        source.readline()
+        for line in source:
+            fields = line.split()
+            if not fields:
+                continue
+            if fields[0] == END_OF_FILE:
+                break
+            yield fields
+
+
+def batched(records, size):
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return numpy.nan
+
+
+def parse_coordinates(pairs):
+    """Convert [latitude, longitude] strings of a whole batch at once.
+
+    Returns:
+        numpy.ndarray: (n, 2) degrees, NaN where malformed or out of range.
+    """
+    if not pairs:
+        return numpy.empty((0, 2))
+
+    try:
+        coordinates = numpy.array(pairs, dtype=numpy.float64)
+    except ValueError:
+        coordinates = numpy.array([[to_float(value) for value in pair] for pair in pairs], dtype=numpy.float64)
+
+    with numpy.errstate(invalid='ignore'):
+        invalid = (numpy.abs(coordinates[:, 0]) > 90) | (numpy.abs(coordinates[:, 1]) > 180)
+    coordinates[invalid] = numpy.nan
+    return coordinates
+
+
+def waypoint_rows(batch):
+    """Convert a batch of earth_fix.dat records to waypoints rows.
+
+    Returns:
+        List: [rows, number of records skipped for missing or bad coordinates]
+    """
+    batch = [fields for fields in batch if len(fields) >= 3]
+    coordinates = parse_coordinates([fields[:2] for fields in batch])
+    valid = ~numpy.isnan(coordinates).any(axis=1)
+
+    rows = []
+    for fields, (latitude, longitude), keep in zip(batch, coordinates.tolist(), valid.tolist()):
+        if not keep:
+            continue
+        airport = fields[3] if len(fields) > 3 and fields[3] != ENROUTE else None
+        region = fields[4] if len(fields) > 4 else None
+        waypoint_type = fields[5] if len(fields) > 5 else None
+        name = ' '.join(fields[6:]) or None
+        rows.append((None, fields[2], latitude, longitude, airport, region, waypoint_type, name))
+
+    return [rows, len(valid) - len(rows)]
+
+
+def airway_rows(batch):
+    """Convert a batch of earth_awy.dat records to airway segment rows.
+
+    Both layouts are read: version 640 with endpoint coordinates, and 1100 with endpoint
+    region and type codes whose coordinates are looked up after loading. Records with
+    another number of fields or a malformed type code or level are skipped.
+
+    Returns:
+        List: [{table: rows}, number of records skipped], a segment on several airways
+            gives one row per airway.
+    """
+    modern = [fields for fields in batch if len(fields) == 11]
+    legacy = [fields for fields in batch if len(fields) == 10]
+    skipped = len(batch) - len(modern) - len(legacy)
+    tables = {table: [] for table in AIRWAY_TABLES.values()}
+
+    for fields in modern:
+        start_ident, start_region, start_type, end_ident, end_region, end_type, direction, level, base, top, names = fields
+        table = AIRWAY_TABLES.get(level)
+        if not table:
+            continue
+        try:
+            start_type, end_type, base, top = int(start_type), int(end_type), int(base), int(top)
+        except ValueError:
+            skipped += 1
+            continue
+        for name in names.split('-'):
+            tables[table].append((
+                None, name, start_ident, start_region, start_type, None, None,
+                end_ident, end_region, end_type, None, None, direction, base, top
+            ))
+
+    starts = parse_coordinates([fields[1:3] for fields in legacy])
+    ends = parse_coordinates([fields[4:6] for fields in legacy])
+    coordinates = numpy.hstack([starts, ends]).tolist()
+
+    for fields, (start_lat, start_lon, end_lat, end_lon) in zip(legacy, coordinates):
+        start_ident, _, _, end_ident, _, _, level, base, top, names = fields
+        table = AIRWAY_TABLES.get(level)
+        if not table:
+            continue
+        try:
+            base, top = int(base), int(top)
+        except ValueError:
+            skipped += 1
+            continue
+        for name in names.split('-'):
+            tables[table].append((
+                None, name, start_ident, None, None, nan_to_none(start_lat), nan_to_none(start_lon),
+                end_ident, None, None, nan_to_none(end_lat), nan_to_none(end_lon), None, base, top
+            ))
+
+    return [tables, skipped]
+
+
+def nan_to_none(value):
+    return None if value != value else value